@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Benchmark парсера без мережі
+Запускає повний main() parser.py на фікстурах http_replay
+з налаштовуваною затримкою та інжекцією помилок
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from http_replay import fixture_path
+
+QUEUE_KEYS = ["1.1", "1.2", "2.1", "2.2", "3.1", "3.2", "4.1", "4.2", "5.1", "5.2", "6.1", "6.2"]
+
+def write_fixture(fixture_dir, name, status, body, headers=None):
+    with open(fixture_path(fixture_dir, name), "w", encoding="utf-8") as f:
+        json.dump({"status": status, "headers": headers or {}, "body": body}, f, ensure_ascii=False, indent=2)
+
+def make_synthetic_fixtures(fixture_dir):
+    """Згенерувати правдоподібні фікстури (логін, кабінет, 12 черг на сьогодні та завтра)"""
+    os.makedirs(fixture_dir, exist_ok=True)
+    write_fixture(fixture_dir, "warmup", 200, "<html></html>")
+    write_fixture(fixture_dir, "login", 200, "<html><a href='/logout'>Вихід</a></html>")
+    write_fixture(fixture_dir, "cabinet", 200, "<html><a href='/logout'>Вихід</a></html>")
+
+    today = datetime.now(ZoneInfo("Europe/Kyiv")).date()
+    for idx, queue_key in enumerate(QUEUE_KEYS):
+        planned = []
+        for day in (today, today + timedelta(days=1)):
+            # Чотирьохгодинні вимкнення зі зсувом для кожної черги, частина - з :30
+            for start in range(idx % 6, 24, 8):
+                begin = datetime(day.year, day.month, day.day, start, 30 if idx % 2 else 0)
+                end = min(begin + timedelta(hours=4), datetime(day.year, day.month, day.day, 23, 59, 59))
+                planned.append({
+                    "accidentid": 0,
+                    "acc_begin": begin.isoformat(),
+                    "accend_plan": end.isoformat(),
+                    "typeid": 1,
+                })
+        body = json.dumps({"planned_list_cab": planned}, ensure_ascii=False)
+        write_fixture(fixture_dir, "queue-" + queue_key, 200, body, {"ETag": f'"{queue_key}-{today}"'})
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--fixtures', required=True, help='папка з фікстурами (ESVITLO_RECORD_DIR запису)')
+    arg_parser.add_argument('--synthetic', action='store_true', help='згенерувати синтетичні фікстури в --fixtures')
+    arg_parser.add_argument('--runs', type=int, default=5)
+    arg_parser.add_argument('--latency', default='0', help='затримка відповіді: "0.2" або "0.1-0.5" сек')
+    arg_parser.add_argument('--error-rate', default='0', help='частка відповідей 503')
+    arg_parser.add_argument('--drop-rate', default='0', help='частка обривів з\'єднання')
+    arg_parser.add_argument('--seed', default='0')
+    arg_parser.add_argument('--warm', action='store_true', help='зберігати кеші між запусками (сесія, черги)')
+    args = arg_parser.parse_args()
+
+    if args.synthetic:
+        make_synthetic_fixtures(args.fixtures)
+
+    os.environ["ESVITLO_REPLAY_DIR"] = os.path.abspath(args.fixtures)
+    os.environ["ESVITLO_REPLAY_LATENCY"] = args.latency
+    os.environ["ESVITLO_REPLAY_ERROR_RATE"] = args.error_rate
+    os.environ["ESVITLO_REPLAY_DROP_RATE"] = args.drop_rate
+    os.environ["ESVITLO_REPLAY_SEED"] = args.seed
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        import parser
+    import_time = time.perf_counter() - started
+
+    workdir = tempfile.mkdtemp(prefix="bench-parser-")
+    timings = []
+    codes = []
+
+    for run in range(args.runs):
+        run_dir = workdir if args.warm else tempfile.mkdtemp(dir=workdir)
+        os.chdir(run_dir)
+
+        # Свіжий бюджет запитів та запобіжник для кожного запуску
+        parser.RATE_LIMITER = parser.TokenBucket(parser.RATE_LIMIT_RPS, parser.RATE_LIMIT_BURST)
+        parser.CIRCUIT_BREAKER = parser.CircuitBreaker(parser.BREAKER_THRESHOLD, parser.BREAKER_COOLDOWN)
+
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            codes.append(parser.main())
+        timings.append(time.perf_counter() - started)
+
+    print(f"[BENCH] Fixtures: {args.fixtures}, latency: {args.latency}s, "
+          f"error rate: {args.error_rate}, drop rate: {args.drop_rate}, warm: {args.warm}")
+    print(f"[BENCH] Import: {import_time * 1000:.1f} ms")
+    print(f"[BENCH] Runs: {len(timings)}, exit codes: {codes}")
+    print(f"[BENCH] main(): min {min(timings) * 1000:.1f} ms, median {statistics.median(timings) * 1000:.1f} ms, "
+          f"max {max(timings) * 1000:.1f} ms")
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark рендерингу PNG: matplotlib vs NumPy
+Кожен запуск - повний render_all.py у порожню папку (без хешів, усі таблиці)
+Окремо - старт у новому процесі python: імпорт numpy, модулів рендерингу та бекенду,
+перший статичний шар (для NumPy - і атлас гліфів); холодний - з порожнім кешем
+ESVITLO_CACHE_DIR/render/ (атлас будується через matplotlib), теплий - з уже заповненим
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Код процесу, що вимірює старт бекенду (аргумент - назва бекенду)
+STARTUP_CODE = """
+import json, sys, time
+started = time.perf_counter()
+import numpy
+numpy_done = time.perf_counter()
+import render_all, render_layout
+modules_done = time.perf_counter()
+render_layout.backend_module(sys.argv[1])
+backend_done = time.perf_counter()
+render_layout.get_template(render_all.QUEUE_LAYOUT, sys.argv[1])
+template_done = time.perf_counter()
+print(json.dumps({
+    "numpy": numpy_done - started,
+    "modules": modules_done - numpy_done,
+    "backend": backend_done - modules_done,
+    "template": template_done - backend_done,
+    "matplotlib": "matplotlib" in sys.modules,
+}))
+"""
+
+def measure_startup(backend, cache_dir):
+    """Старт бекенду в новому процесі з кешем cache_dir: (час процесу, етапи зсередини)"""
+    env = dict(os.environ, ESVITLO_CACHE_DIR=cache_dir, ESVITLO_LOG_LEVEL="warning")
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", STARTUP_CODE, backend], env=env, check=True,
+                            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    total = time.perf_counter() - started
+    return total, json.loads(result.stdout.strip().splitlines()[-1])
+
+def format_startup(label, total, stages):
+    return (f"[BENCH] {label}: process {total * 1000:.0f} ms (numpy {stages['numpy'] * 1000:.0f} ms, "
+            f"render modules {stages['modules'] * 1000:.0f} ms, backend {stages['backend'] * 1000:.0f} ms, "
+            f"first template {stages['template'] * 1000:.0f} ms; "
+            f"matplotlib imported: {'yes' if stages['matplotlib'] else 'no'})")
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--json', required=True, help='файл даних (data/*.json)')
+    arg_parser.add_argument('--runs', type=int, default=5)
+    arg_parser.add_argument('--backend', action='append', default=None,
+                            help='matplotlib / numpy (можна кілька разів; за замовчуванням обидва)')
+    args = arg_parser.parse_args()
+
+    # Журнал рендерингу буферизується - вимикаємо [OK] / [SPAN], лишаємо попередження
+    os.environ.setdefault("ESVITLO_LOG_LEVEL", "warning")
+    import render_all
+    import render_layout
+
+    workdir = tempfile.mkdtemp(prefix="bench-render-")
+    data = render_all.load_data(args.json)
+    fact = data.get('fact', {})
+    days = render_all.schedule_days(fact.get('data', {}), str(fact.get('today')))
+
+    for backend in args.backend or sorted(render_layout.BACKENDS):
+        # Холодний старт - порожній кеш, теплий - той самий кеш після холодного
+        cache_dir = tempfile.mkdtemp(dir=workdir)
+        cold = measure_startup(backend, cache_dir)
+        warm = measure_startup(backend, cache_dir)
+
+        render_layout.get_template(render_all.QUEUE_LAYOUT, backend)
+        timings = []
+        sizes = []
+        for run in range(args.runs):
+            out_p, hash_dir = render_layout.output_dirs(tempfile.mkdtemp(dir=workdir))
+            started = time.perf_counter()
+            render_all.render_queue_images(data, out_p, hash_dir, backend=backend)
+            for offset in range(len(days)):
+                render_all.render_day_image(data, out_p, hash_dir, offset, backend)
+            timings.append(time.perf_counter() - started)
+            sizes.append(sum(p.stat().st_size for p in out_p.glob('*.png')))
+
+        images = len(list(out_p.glob('*.png')))
+        print(f"[BENCH] Backend: {backend}, images: {images}, total size: {sizes[-1] / 1024:.0f} KiB")
+        print(format_startup("Cold start (empty cache)", *cold))
+        print(format_startup("Warm start (cached)", *warm))
+        print(f"[BENCH] render_all: min {min(timings) * 1000:.1f} ms, median {statistics.median(timings) * 1000:.1f} ms, "
+              f"max {max(timings) * 1000:.1f} ms ({statistics.median(timings) * 1000 / max(images, 1):.1f} ms/image)")
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Стрічка змін (delta feed) між послідовними знімками даних
+Кожне збереження зі зміненим розкладом додає один рядок JSON у файл .jsonl:
+номер (seq), хеші до/після та операції RFC 6902 (JSON Patch) над "fact"
+Клієнт, що бачив seq N, застосовує тільки записи з seq > N
+"""
+
+import json
+import os
+
+def json_pointer(*parts):
+    """Шлях JSON Pointer (RFC 6901) з частин: ("fact", "data", "1765", "GPV1.1") -> /fact/data/1765/GPV1.1"""
+    return "".join("/" + str(part).replace("~", "~0").replace("/", "~1") for part in parts)
+
+def diff_dict(prev, new, *path):
+    """Операції add / remove / replace для ключів першого рівня словника"""
+    ops = []
+    for key in prev:
+        if key not in new:
+            ops.append({"op": "remove", "path": json_pointer(*path, key)})
+    for key, value in new.items():
+        if key not in prev:
+            ops.append({"op": "add", "path": json_pointer(*path, key), "value": value})
+        elif prev[key] != value:
+            ops.append({"op": "replace", "path": json_pointer(*path, key), "value": value})
+    return ops
+
+def diff_fact(prev_fact, new_fact):
+    """Операції RFC 6902 над документом даних, що змінюють розклади prev_fact на new_fact
+
+    Для спільних днів та черг - по одному слоту (fact.data) та цілий список
+    інтервалів черги (fact.timeline); нові / зниклі дні - цілим об'єктом.
+    Порожній список - розклади не змінились. Без попереднього знімка - один "add" всього "fact".
+    """
+    if not prev_fact:
+        return [{"op": "add", "path": json_pointer("fact"), "value": new_fact}]
+
+    ops = []
+    for section in ("data", "timeline"):
+        prev_days = prev_fact.get(section, {})
+        new_days = new_fact.get(section, {})
+        if section not in prev_fact:
+            if new_days:
+                ops.append({"op": "add", "path": json_pointer("fact", section), "value": new_days})
+            continue
+
+        for day in prev_days:
+            if day not in new_days:
+                ops.append({"op": "remove", "path": json_pointer("fact", section, day)})
+        for day, queues in new_days.items():
+            if day not in prev_days:
+                ops.append({"op": "add", "path": json_pointer("fact", section, day), "value": queues})
+            elif section == "data":
+                for gpv_key, slots in queues.items():
+                    prev_slots = prev_days[day].get(gpv_key)
+                    if prev_slots is None:
+                        ops.append({"op": "add", "path": json_pointer("fact", section, day, gpv_key), "value": slots})
+                    else:
+                        ops.extend(diff_dict(prev_slots, slots, "fact", section, day, gpv_key))
+            else:
+                ops.extend(diff_dict(prev_days[day], queues, "fact", section, day))
+    return ops
+
+def reversed_lines(f, block=4096):
+    """Рядки двійкового файлу (без переводу рядка) від останнього до першого; читає з кінця блоками"""
+    f.seek(0, os.SEEK_END)
+    position = f.tell()
+    rest = b""
+    while position > 0:
+        step = min(block, position)
+        position -= step
+        f.seek(position)
+        lines = (f.read(step) + rest).split(b"\n")
+        rest = lines.pop(0)
+        yield from reversed(lines)
+    yield rest
+
+def last_sequence(path):
+    """Номер останнього цілого запису стрічки (0, якщо стрічки ще немає)
+
+    Читає файл з кінця блоками, тож вартість не залежить від довжини стрічки.
+    Обірваний (перерваний посеред запису) або пошкоджений рядок пропускається.
+    """
+    if not os.path.exists(path):
+        return 0
+    with open(path, "rb") as f:
+        for line in reversed_lines(f):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                return json.loads(line)["seq"]
+            except (ValueError, KeyError, TypeError):
+                continue
+    return 0
+
+def truncate_partial_tail(path):
+    """Відрізати останній рядок без переводу рядка (запис, перерваний посеред write)
+
+    Інакше наступний запис дописався б у той самий рядок. Повертає кількість відрізаних байтів.
+    """
+    if not os.path.exists(path):
+        return 0
+    with open(path, "rb+") as f:
+        tail = next(reversed_lines(f))
+        if tail:
+            f.truncate(f.seek(0, os.SEEK_END) - len(tail))
+            f.flush()
+            os.fsync(f.fileno())
+    return len(tail)
+
+def append_record(path, record):
+    """Дописати запис у кінець стрічки одним write (файл тільки доповнюється)"""
+    line = json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(line)
+        f.flush()
+        os.fsync(f.fileno())
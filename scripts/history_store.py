@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Історія розкладів у SQLite
+Кожен окремий розклад (день, черга, 48-бітна маска slot_codec) зберігається
+один раз з часом, коли його вперше побачили - база росте з кількістю змін,
+а не з кількістю опитувань
+Індекси - для вибірок за чергою, діапазоном днів та часом появи версії
+Постійна копія - текстовий журнал (.jsonl, один рядок на версію, тільки доповнюється):
+його можна комітити, а базу - відновити з нього (replay_log, outage_analytics.py --log)
+
+CLI:
+  history_store.py --db history.sqlite ingest data/Vinnytsiaoblenerho.json
+  history_store.py --db history.sqlite query --queue GPV3.1 --from 2025-12-01 --to 2025-12-31
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import delta_feed
+import slot_codec
+
+KYIV_TZ = ZoneInfo("Europe/Kyiv")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    day INTEGER NOT NULL,           -- північ доби за Києвом, Unix timestamp
+    queue TEXT NOT NULL,            -- GPV1.1 ... GPV6.2
+    mask INTEGER NOT NULL,          -- slot_codec: біт i - немає світла в i-ту півгодину
+    timeline TEXT,                  -- хвилинні інтервали [[початок, кінець], ...] (JSON)
+    observed_at INTEGER NOT NULL    -- коли цей розклад вперше побачили, Unix timestamp
+);
+-- (queue, day, observed_at) покриває і вибірки тільки за (queue, day); старий індекс не потрібен
+DROP INDEX IF EXISTS idx_snapshots_queue_day;
+CREATE INDEX IF NOT EXISTS idx_snapshots_queue_day_observed ON snapshots (queue, day, observed_at);
+CREATE INDEX IF NOT EXISTS idx_snapshots_day ON snapshots (day, queue);
+CREATE TABLE IF NOT EXISTS log_state (
+    log TEXT PRIMARY KEY,           -- назва файлу журналу
+    offset INTEGER NOT NULL         -- скільки байтів журналу вже перенесено в snapshots
+);
+"""
+
+class HistoryStore:
+    """Сховище історії розкладів (SQLite, один файл)"""
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def latest_masks(self, day_from=None):
+        """Остання записана маска для кожної пари (день, черга): {"день/GPV": маска}"""
+        rows = self.conn.execute(
+            """
+            SELECT day, queue, mask FROM snapshots AS s
+            WHERE day >= ? AND id = (
+                SELECT MAX(id) FROM snapshots
+                WHERE queue = s.queue AND day = s.day
+            )
+            """,
+            (day_from or 0,),
+        )
+        return {f"{day}/{queue}": mask for day, queue, mask in rows}
+
+    def published_keys(self, day_from=None):
+        """Пари "день/GPV", для яких уже є опублікований розклад (хоч одна версія з вимкненнями)"""
+        rows = self.conn.execute(
+            "SELECT DISTINCT day, queue FROM snapshots WHERE day >= ? AND mask != 0", (day_from or 0,))
+        return {f"{day}/{queue}" for day, queue in rows}
+
+    def ingest(self, fact_masks, fact_timeline, observed_at, log_path=None):
+        """Записати розклади, маска яких відрізняється від останньої збереженої
+
+        fact_masks - {"день/GPV": маска}, fact_timeline - {день: {GPV: інтервали}}.
+        Порожня маска до першої публікації - заготовка дня горизонту (розкладу ще немає),
+        не версія; після публікації - зміна розкладу (вимкнення скасували).
+        log_path - дописати нові версії і в журнал (після replay_log того ж журналу).
+        Повертає додані розклади: [("день/GPV", попередня опублікована маска або None, маска), ...].
+        """
+        day_from = min((int(key.split("/")[0]) for key in fact_masks), default=0)
+        latest = self.latest_masks(day_from)
+        published = self.published_keys(day_from)
+
+        rows = []
+        added = []
+        for key, mask in sorted(fact_masks.items()):
+            if key not in published:
+                if not mask:
+                    continue
+                # Перша публікація; заготовки, записані старішими версіями, не рахуються
+                previous = None
+            elif latest.get(key) == mask:
+                continue
+            else:
+                previous = latest[key]
+            day, queue = key.split("/")
+            timeline = fact_timeline.get(day, {}).get(queue)
+            rows.append((int(day), queue, mask, json.dumps(timeline) if timeline is not None else None, observed_at))
+            added.append((key, previous, mask))
+
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO snapshots (day, queue, mask, timeline, observed_at) VALUES (?, ?, ?, ?, ?)", rows)
+        if log_path and rows:
+            self.append_log(log_path, rows)
+        return added
+
+    def log_offset(self, log_path):
+        """Скільки байтів журналу вже перенесено в базу"""
+        row = self.conn.execute("SELECT offset FROM log_state WHERE log = ?", (os.path.basename(log_path),)).fetchone()
+        return row[0] if row else 0
+
+    def set_log_offset(self, log_path, offset):
+        with self.conn:
+            self.conn.execute(
+                "INSERT INTO log_state (log, offset) VALUES (?, ?) ON CONFLICT (log) DO UPDATE SET offset = excluded.offset",
+                (os.path.basename(log_path), offset))
+
+    def append_log(self, log_path, rows):
+        """Дописати рядки snapshots (без id) у журнал одним write
+
+        Якщо журнал до запису вже був повністю в базі, позначка зсуву переходить на його новий кінець.
+        """
+        delta_feed.truncate_partial_tail(log_path)
+        lines = "".join(
+            json.dumps({"day": day, "queue": queue, "mask": mask,
+                        "timeline": json.loads(timeline) if timeline is not None else None, "at": observed_at},
+                       separators=(",", ":")) + "\n"
+            for day, queue, mask, timeline, observed_at in rows)
+        with open(log_path, "ab") as f:
+            synced = f.tell() == self.log_offset(log_path)
+            f.write(lines.encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+            if synced:
+                self.set_log_offset(log_path, f.tell())
+
+    def export_log(self, log_path):
+        """Записати всю історію бази в новий журнал; повертає кількість версій"""
+        rows = self.conn.execute("SELECT day, queue, mask, timeline, observed_at FROM snapshots ORDER BY id").fetchall()
+        if rows:
+            self.set_log_offset(log_path, 0)
+            self.append_log(log_path, rows)
+        return len(rows)
+
+    def reset(self):
+        """Очистити історію (перед повторним перенесенням журналу з початку)"""
+        with self.conn:
+            self.conn.execute("DELETE FROM snapshots")
+            self.conn.execute("DELETE FROM log_state")
+
+    def replay_log(self, log_path):
+        """Перенести в базу записи журналу після вже перенесеної частини
+
+        Записи з однаковим часом - одним ingest, як їх і записали; обірваний останній
+        рядок не переноситься. Повертає [(додані розклади ingest, час), ...].
+        """
+        if not os.path.exists(log_path):
+            return []
+        offset = self.log_offset(log_path)
+        with open(log_path, "rb") as f:
+            f.seek(offset)
+            data = f.read()
+        complete = data[:data.rfind(b"\n") + 1]
+
+        batches = []
+        masks, timelines, observed_at = {}, {}, None
+
+        def flush():
+            if masks:
+                batches.append((self.ingest(masks, timelines, observed_at), observed_at))
+
+        for line in complete.splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            key = f"{record['day']}/{record['queue']}"
+            if record["at"] != observed_at or key in masks:
+                flush()
+                masks, timelines = {}, {}
+            observed_at = record["at"]
+            masks[key] = record["mask"]
+            if record["timeline"] is not None:
+                timelines.setdefault(str(record["day"]), {})[record["queue"]] = record["timeline"]
+        flush()
+
+        self.set_log_offset(log_path, offset + len(complete))
+        return batches
+
+    def ingest_data(self, data):
+        """Записати розклади з документа даних (формат data/Vinnytsiaoblenerho.json)"""
+        fact = data.get("fact", {})
+        return self.ingest(slot_codec.encode_fact_data(fact.get("data", {})),
+                           fact.get("timeline", {}), int(data.get("lastUpdated", 0)))
+
+    def history(self, queue=None, day_from=None, day_to=None):
+        """Усі збережені версії розкладів: [(день, черга, маска, інтервали, час), ...]
+
+        Фільтри - черга та діапазон днів [day_from, day_to] (Unix timestamps).
+        Відсортовано за днем, чергою та порядком запису (версії однієї пари - від першої до останньої).
+        """
+        sql = "SELECT day, queue, mask, timeline, observed_at FROM snapshots WHERE day BETWEEN ? AND ?"
+        params = [day_from if day_from is not None else 0, day_to if day_to is not None else 2 ** 62]
+        if queue:
+            sql += " AND queue = ?"
+            params.append(queue)
+        sql += " ORDER BY day, queue, id"
+        return [
+            (day, queue_key, mask, json.loads(timeline) if timeline else None, observed_at)
+            for day, queue_key, mask, timeline, observed_at in self.conn.execute(sql, params)
+        ]
+
+def day_ts(date_str):
+    """"2025-12-07" -> північ за Києвом, Unix timestamp"""
+    return int(datetime.strptime(date_str, "%Y-%m-%d").replace(tzinfo=KYIV_TZ).timestamp())
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--db', required=True, help='файл SQLite')
+    commands = arg_parser.add_subparsers(dest='command', required=True)
+
+    ingest = commands.add_parser('ingest', help='додати розклади з файлів даних')
+    ingest.add_argument('files', nargs='+')
+
+    query = commands.add_parser('query', help='вивести історію розкладів')
+    query.add_argument('--queue', default=None, help='напр. GPV3.1')
+    query.add_argument('--from', dest='day_from', default=None, help='YYYY-MM-DD')
+    query.add_argument('--to', dest='day_to', default=None, help='YYYY-MM-DD')
+    args = arg_parser.parse_args()
+
+    with HistoryStore(args.db) as store:
+        if args.command == 'ingest':
+            for path in args.files:
+                with open(path, "r", encoding="utf-8") as f:
+                    added = store.ingest_data(json.load(f))
+                print(f"[HISTORY] {path}: {len(added)} new schedules")
+        else:
+            rows = store.history(args.queue,
+                                 day_ts(args.day_from) if args.day_from else None,
+                                 day_ts(args.day_to) if args.day_to else None)
+            for day, queue_key, mask, _, observed_at in rows:
+                day_str = datetime.fromtimestamp(day, KYIV_TZ).strftime('%Y-%m-%d')
+                seen_str = datetime.fromtimestamp(observed_at, KYIV_TZ).strftime('%Y-%m-%d %H:%M')
+                off_hours = slot_codec.off_halfhours(mask) / 2
+                print(f"{day_str} {queue_key:7} {slot_codec.mask_to_hex(mask)} {off_hours:4.1f}h off (seen {seen_str})")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+HTTP Record/Replay для парсера e-svitlo
+Запис: зберігає відповіді (логін, кабінет, черги) у папку з фікстурами
+Відтворення: transport adapter для requests, що віддає фікстури
+з налаштовуваною затримкою та інжекцією помилок - без мережі та облікових даних
+"""
+import json
+import os
+import random
+import threading
+import time
+
+from requests.adapters import HTTPAdapter
+from requests.exceptions import ConnectionError as RequestsConnectionError
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+
+# Заголовки, які не зберігаються у фікстурах (токени сесії)
+SKIPPED_HEADERS = {'set-cookie', 'cookie', 'content-encoding', 'transfer-encoding', 'content-length'}
+
+def fixture_path(fixture_dir, name):
+    """Шлях до файлу фікстури за логічною назвою (login, cabinet, queue-1.1, ...)"""
+    return os.path.join(fixture_dir, name + ".json")
+
+class Recorder:
+    """requestPostHook для cloudscraper: зберігає кожну відповідь у фікстуру
+
+    name_for(method, url) повертає логічну назву запиту, тож у фікстурах
+    немає URL з EIC. Повторний запит з тією ж назвою перезаписує фікстуру.
+    """
+
+    def __init__(self, fixture_dir, name_for):
+        self.fixture_dir = fixture_dir
+        self.name_for = name_for
+        self._lock = threading.Lock()
+        os.makedirs(fixture_dir, exist_ok=True)
+
+    def hook(self, scraper, response):
+        # Початковий запит (до редиректів)
+        first = response.history[0] if response.history else response
+        name = self.name_for(first.request.method, first.request.url)
+
+        fixture = {
+            "method": first.request.method,
+            "status": response.status_code,
+            "headers": {k: v for k, v in response.headers.items() if k.lower() not in SKIPPED_HEADERS},
+            "body": response.text,
+        }
+
+        with self._lock:
+            with open(fixture_path(self.fixture_dir, name), "w", encoding="utf-8") as f:
+                json.dump(fixture, f, ensure_ascii=False, indent=2)
+        return response
+
+class ReplayAdapter(HTTPAdapter):
+    """Transport adapter, що відповідає з фікстур замість мережі
+
+    latency - затримка відповіді в секундах (число або (min, max)),
+    error_rate - ймовірність відповіді 503, drop_rate - ймовірність
+    мережевої помилки. Випадковість детермінована через seed.
+    Підтримує If-None-Match / If-Modified-Since (відповідь 304).
+    """
+
+    def __init__(self, fixture_dir, name_for, latency=0.0, error_rate=0.0, drop_rate=0.0, seed=0):
+        super().__init__()
+        self.fixture_dir = fixture_dir
+        self.name_for = name_for
+        self.latency = latency
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.requests_served = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._fixtures = {}
+
+    def _load(self, name):
+        if name not in self._fixtures:
+            path = fixture_path(self.fixture_dir, name)
+            if not os.path.exists(path):
+                self._fixtures[name] = None
+            else:
+                with open(path, "r", encoding="utf-8") as f:
+                    self._fixtures[name] = json.load(f)
+        return self._fixtures[name]
+
+    def _draw(self):
+        """Затримка та тип помилки для одного запиту (під lock - детермінованість)"""
+        with self._lock:
+            self.requests_served += 1
+            if isinstance(self.latency, (tuple, list)):
+                delay = self._random.uniform(*self.latency)
+            else:
+                delay = self.latency
+            roll = self._random.random()
+
+        if roll < self.drop_rate:
+            return delay, "drop"
+        if roll < self.drop_rate + self.error_rate:
+            return delay, "error"
+        return delay, None
+
+    def send(self, request, **kwargs):
+        name = self.name_for(request.method, request.url)
+        delay, failure = self._draw()
+        if delay:
+            time.sleep(delay)
+
+        if failure == "drop":
+            raise RequestsConnectionError("replay: injected connection error for " + name, request=request)
+
+        with self._lock:
+            fixture = self._load(name)
+
+        if failure == "error":
+            status, headers, body = 503, {}, ""
+        elif fixture is None:
+            status, headers, body = 404, {}, ""
+        else:
+            status, headers, body = fixture["status"], fixture["headers"], fixture["body"]
+
+            # Умовні запити
+            etag = headers.get("ETag")
+            last_modified = headers.get("Last-Modified")
+            if ((etag and request.headers.get("If-None-Match") == etag)
+                    or (last_modified and request.headers.get("If-Modified-Since") == last_modified)):
+                status, body = 304, ""
+
+        return self.build_replay_response(request, status, headers, body)
+
+    def build_replay_response(self, request, status, headers, body):
+        response = Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(headers)
+        response._content = body.encode("utf-8")
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        response.reason = "Replay"
+        response.connection = self
+        return response
+
+    def close(self):
+        pass
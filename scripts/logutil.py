@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Логер парсера та рендерерів
+Рівні (debug / info / warning / error), буферизований вивід,
+текстовий або JSON-lines формат та таймінги етапів (span)
+Налаштування: ESVITLO_LOG_LEVEL, ESVITLO_LOG_FORMAT
+"""
+
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+LEVELS = {"debug": DEBUG, "info": INFO, "warning": WARNING, "error": ERROR}
+LEVEL_NAMES = {value: name for name, value in LEVELS.items()}
+
+class Logger:
+    """Рівневий логер з буфером рядків
+
+    Повідомлення нижче рівня відкидаються до форматування: аргументи
+    підставляються (msg % args) тільки для увімкнених рівнів.
+    Буфер скидається, коли набирається buffer_lines рядків, на рівні
+    warning і вище, при flush() та при виході з процесу. Потік виводу
+    визначається в момент скидання (sys.stdout за замовчуванням).
+    """
+
+    def __init__(self, level=INFO, fmt="text", stream=None, buffer_lines=64):
+        self.level = level
+        self.fmt = fmt
+        self.stream = stream
+        self.buffer_lines = buffer_lines
+        self._buffer = []
+        self._lock = threading.Lock()
+
+    def enabled(self, level):
+        return level >= self.level
+
+    def _emit(self, level, msg, args, fields):
+        if level < self.level:
+            return
+        if args:
+            msg = msg % args
+
+        if self.fmt == "json":
+            record = {
+                "ts": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+                "level": LEVEL_NAMES[level],
+                "msg": msg,
+            }
+            record.update(fields)
+            line = json.dumps(record, ensure_ascii=False)
+        else:
+            line = msg
+
+        with self._lock:
+            self._buffer.append(line)
+            if len(self._buffer) >= self.buffer_lines or level >= WARNING:
+                self._flush_locked()
+
+    def _flush_locked(self):
+        if not self._buffer:
+            return
+        stream = self.stream or sys.stdout
+        # Один write на скидання, щоб рядки з потоків не перемішувались
+        stream.write("\n".join(self._buffer) + "\n")
+        stream.flush()
+        self._buffer = []
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def debug(self, msg, *args, **fields):
+        self._emit(DEBUG, msg, args, fields)
+
+    def info(self, msg, *args, **fields):
+        self._emit(INFO, msg, args, fields)
+
+    def warning(self, msg, *args, **fields):
+        self._emit(WARNING, msg, args, fields)
+
+    def error(self, msg, *args, **fields):
+        self._emit(ERROR, msg, args, fields)
+
+    @contextmanager
+    def span(self, name, **fields):
+        """Виміряти тривалість блоку: '[SPAN] name key=value: 12.3 ms' (info)"""
+        started = time.perf_counter()
+        error = None
+        try:
+            yield
+        except BaseException as e:
+            error = type(e).__name__
+            raise
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            label = " ".join([name] + [f"{key}={value}" for key, value in fields.items()])
+            suffix = f" ({error})" if error else ""
+            record = dict(fields, span=name, ms=round(elapsed_ms, 1))
+            if error:
+                record["error"] = error
+            self.info("[SPAN] %s: %.1f ms%s", label, elapsed_ms, suffix, **record)
+
+_logger = None
+
+def get_logger():
+    """Спільний логер процесу, налаштований зі змінних оточення"""
+    global _logger
+    if _logger is None:
+        level = LEVELS.get(os.getenv("ESVITLO_LOG_LEVEL", "info").lower(), INFO)
+        fmt = "json" if os.getenv("ESVITLO_LOG_FORMAT", "text").lower() == "json" else "text"
+        _logger = Logger(level, fmt)
+        atexit.register(_logger.flush)
+    return _logger
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Аналітика вимкнень над історією розкладів (history_store)
+Історія завантажується в масиви NumPy (черги × дні × 48 півгодин),
+агрегати рахуються векторно: години без світла за день / тиждень,
+справедливість між чергами, як часто розклад змінюють після публікації
+та за скільки годин до початку доби його публікують
+Лічильники по чергах оновлюються інкрементно при кожному збереженні
+
+CLI:
+  outage_analytics.py --db .cache/history.sqlite --from 2025-12-01 --to 2025-12-31
+  outage_analytics.py --db history.sqlite --log data/Vinnytsiaoblenerho.history.jsonl   (база з журналу)
+  outage_analytics.py --db .cache/history.sqlite --save-cube cube/   (масиви .npy для np.load(mmap_mode='r'))
+"""
+
+import argparse
+import os
+import sys
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import history_store
+import slot_codec
+
+HALFHOURS = 2 * slot_codec.NUM_SLOTS
+
+COUNTERS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS queue_counters (
+    queue TEXT PRIMARY KEY,
+    days INTEGER NOT NULL DEFAULT 0,             -- дні, для яких розклад опублікували
+    halfhours_off INTEGER NOT NULL DEFAULT 0,    -- півгодини без світла за останніми версіями
+    versions INTEGER NOT NULL DEFAULT 0,         -- усі збережені версії розкладів
+    revisions INTEGER NOT NULL DEFAULT 0,        -- версії після першої публікації дня
+    lead_seconds INTEGER NOT NULL DEFAULT 0      -- сума (початок доби - перша публікація з вимкненнями)
+);
+"""
+
+# Масиви куба, що зберігаються / завантажуються як .npy
+CUBE_ARRAYS = ("days", "queues", "bits", "present", "versions", "first_seen")
+
+class HistoryCube:
+    """Остання версія розкладу кожної черги на кожен день у масивах NumPy
+
+    days [D] - північ доби (Unix), queues [Q] - GPV ключі,
+    bits [Q, D, 48] uint8 - 1 = немає світла в півгодину,
+    present [Q, D] - чи опубліковано розклад, versions [Q, D] - кількість версій,
+    first_seen [Q, D] - коли розклад опублікували (вперше побачили з вимкненнями, Unix).
+    """
+
+    def __init__(self, days, queues, bits, present, versions, first_seen):
+        self.days = days
+        self.queues = queues
+        self.bits = bits
+        self.present = present
+        self.versions = versions
+        self.first_seen = first_seen
+
+    @classmethod
+    def empty(cls):
+        """Куб без жодного розкладу"""
+        empty = np.zeros((0, 0), dtype=np.int64)
+        return cls(np.zeros(0, dtype=np.int64), np.array([], dtype=str),
+                   np.zeros((0, 0, HALFHOURS), dtype=np.uint8), empty.astype(bool), empty, empty)
+
+    @classmethod
+    def from_store(cls, store, day_from=None, day_to=None):
+        rows = store.history(None, day_from, day_to)
+        if not rows:
+            return cls.empty()
+
+        # Рядки відсортовані за (день, черга, порядок запису): межі груп - зміна пари (день, черга)
+        day_col = np.array([row[0] for row in rows], dtype=np.int64)
+        queue_col = np.array([row[1] for row in rows])
+        mask_col = np.array([row[2] for row in rows], dtype=np.uint64)
+        seen_col = np.array([row[4] for row in rows], dtype=np.int64)
+
+        # Порожні маски до першої публікації пари - заготовки днів горизонту (їх записували
+        # старіші версії history_store): відкидаємо, перша версія - перша справжня публікація
+        published = published_rows(day_col, queue_col, mask_col)
+        if not published.any():
+            return cls.empty()
+        day_col, queue_col, mask_col, seen_col = (
+            day_col[published], queue_col[published], mask_col[published], seen_col[published])
+
+        days, day_idx = np.unique(day_col, return_inverse=True)
+        queues, queue_idx = np.unique(queue_col, return_inverse=True)
+
+        group_start = np.ones(len(day_col), dtype=bool)
+        group_start[1:] = (day_idx[1:] != day_idx[:-1]) | (queue_idx[1:] != queue_idx[:-1])
+        first = np.flatnonzero(group_start)
+        last = np.append(first[1:], len(day_col)) - 1
+
+        shape = (len(queues), len(days))
+        present = np.zeros(shape, dtype=bool)
+        versions = np.zeros(shape, dtype=np.int64)
+        first_seen = np.zeros(shape, dtype=np.int64)
+        bits = np.zeros(shape + (HALFHOURS,), dtype=np.uint8)
+
+        q, d = queue_idx[first], day_idx[first]
+        present[q, d] = True
+        versions[q, d] = last - first + 1
+        first_seen[q, d] = seen_col[first]
+        bits[q, d] = unpack_masks(mask_col[last])
+        return cls(days, queues, bits, present, versions, first_seen)
+
+    def save(self, directory):
+        """Зберегти масиви як .npy (для завантаження з mmap_mode='r')"""
+        os.makedirs(directory, exist_ok=True)
+        for name in CUBE_ARRAYS:
+            np.save(os.path.join(directory, name + ".npy"), getattr(self, name))
+
+    @classmethod
+    def load(cls, directory, mmap=True):
+        """Завантажити масиви; з mmap=True - без читання всього файлу в пам'ять"""
+        return cls(*(np.load(os.path.join(directory, name + ".npy"), mmap_mode="r" if mmap else None)
+                     for name in CUBE_ARRAYS))
+
+    def hours_off(self):
+        """Години без світла [Q, D] (NaN - розкладу немає)"""
+        hours = self.bits.sum(axis=2, dtype=np.int64) / 2.0
+        return np.where(self.present, hours, np.nan)
+
+    def weekly_hours_off(self):
+        """Години без світла за тиждень (з понеділка): (початки тижнів [W], години [Q, W])"""
+        week_starts = np.array([week_start(day) for day in self.days.tolist()], dtype=np.int64)
+        weeks, week_idx = np.unique(week_starts, return_inverse=True)
+        totals = np.zeros((len(self.queues), len(weeks)))
+        np.add.at(totals, (slice(None), week_idx), np.nan_to_num(self.hours_off()))
+        return weeks, totals
+
+    def fairness(self):
+        """Справедливість між чергами за сумою годин без світла
+
+        Індекс Джайна (1.0 - усім порівну, 1/Q - все на одну чергу),
+        коефіцієнт варіації та різниця max - min (години).
+        """
+        totals = np.nansum(self.hours_off(), axis=1)
+        if totals.size == 0 or not totals.any():
+            return {"jain": 1.0, "cv": 0.0, "spread": 0.0}
+        return {
+            "jain": float(totals.sum() ** 2 / (totals.size * (totals ** 2).sum())),
+            "cv": float(totals.std() / totals.mean()),
+            "spread": float(totals.max() - totals.min()),
+        }
+
+    def revisions(self):
+        """Скільки разів розклад змінювали після першої публікації [Q, D] (заготовки днів не рахуються)"""
+        return np.where(self.present, self.versions - 1, 0)
+
+    def lead_hours(self):
+        """За скільки годин до початку доби розклад опублікували [Q, D] (від'ємне - вже протягом доби)"""
+        return np.where(self.present, (self.days[None, :] - self.first_seen) / 3600.0, np.nan)
+
+def published_rows(day_col, queue_col, mask_col):
+    """Рядки історії (відсортовані за днем, чергою, порядком запису), починаючи з першої
+    непорожньої маски своєї пари (день, черга) [N] bool"""
+    group_start = np.ones(len(day_col), dtype=bool)
+    group_start[1:] = (day_col[1:] != day_col[:-1]) | (queue_col[1:] != queue_col[:-1])
+    group = np.cumsum(group_start) - 1
+    # Наростаючий максимум (група, чи були вимкнення): непарний - у групі вже була публікація
+    seen = np.maximum.accumulate(group * 2 + (mask_col != 0))
+    return seen == group * 2 + 1
+
+def unpack_masks(masks):
+    """48-бітні маски [N] -> біти [N, 48] uint8"""
+    shifts = np.arange(HALFHOURS, dtype=np.uint64)
+    return ((np.asarray(masks, dtype=np.uint64)[:, None] >> shifts) & np.uint64(1)).astype(np.uint8)
+
+def week_start(day):
+    """Північ понеділка того тижня, до якого належить доба (Unix)"""
+    date = datetime.fromtimestamp(day, history_store.KYIV_TZ).date()
+    monday = date - timedelta(days=date.weekday())
+    return history_store.day_ts(monday.isoformat())
+
+def update_counters(conn, added, observed_at):
+    """Інкрементно оновити лічильники черг новими розкладами з HistoryStore.ingest"""
+    conn.executescript(COUNTERS_SCHEMA)
+    rows = []
+    for key, previous, mask in added:
+        day, queue = key.split("/")
+        off = slot_codec.off_halfhours(mask)
+        if previous is None:
+            rows.append((queue, 1, off, 1, 0, int(day) - observed_at))
+        else:
+            rows.append((queue, 0, off - slot_codec.off_halfhours(previous), 1, 1, 0))
+
+    with conn:
+        conn.executemany(
+            """
+            INSERT INTO queue_counters (queue, days, halfhours_off, versions, revisions, lead_seconds)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (queue) DO UPDATE SET
+                days = days + excluded.days,
+                halfhours_off = halfhours_off + excluded.halfhours_off,
+                versions = versions + excluded.versions,
+                revisions = revisions + excluded.revisions,
+                lead_seconds = lead_seconds + excluded.lead_seconds
+            """,
+            rows,
+        )
+
+def sync_history(store, log_path):
+    """Перенести в базу нові записи журналу історії та оновити ними лічильники
+
+    Якщо журнал коротший за вже перенесену частину (його переписали), база будується з нуля.
+    Повертає кількість перенесених версій.
+    """
+    conn = store.conn
+    conn.executescript(COUNTERS_SCHEMA)
+    if os.path.exists(log_path) and os.path.getsize(log_path) < store.log_offset(log_path):
+        store.reset()
+        with conn:
+            conn.execute("DELETE FROM queue_counters")
+
+    replayed = 0
+    for added, observed_at in store.replay_log(log_path):
+        update_counters(conn, added, observed_at)
+        replayed += len(added)
+    return replayed
+
+def load_counters(conn):
+    """Лічильники черг: {GPV: {days, halfhours_off, versions, revisions, lead_seconds}}"""
+    conn.executescript(COUNTERS_SCHEMA)
+    columns = ("days", "halfhours_off", "versions", "revisions", "lead_seconds")
+    return {
+        row[0]: dict(zip(columns, row[1:]))
+        for row in conn.execute("SELECT queue, " + ", ".join(columns) + " FROM queue_counters ORDER BY queue")
+    }
+
+def main():
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--db', required=True, help='файл SQLite історії')
+    arg_parser.add_argument('--from', dest='day_from', default=None, help='YYYY-MM-DD')
+    arg_parser.add_argument('--to', dest='day_to', default=None, help='YYYY-MM-DD')
+    arg_parser.add_argument('--save-cube', default=None, help='зберегти масиви .npy у папку')
+    arg_parser.add_argument('--log', default=None,
+                            help='спершу перенести в базу нові записи журналу історії (.jsonl)')
+    args = arg_parser.parse_args()
+
+    with history_store.HistoryStore(args.db) as store:
+        if args.log:
+            print(f"[ANALYTICS] Replayed {sync_history(store, args.log)} schedules from {args.log}")
+        cube = HistoryCube.from_store(
+            store,
+            history_store.day_ts(args.day_from) if args.day_from else None,
+            history_store.day_ts(args.day_to) if args.day_to else None,
+        )
+        counters = load_counters(store.conn)
+
+    if args.save_cube:
+        cube.save(args.save_cube)
+        print(f"[ANALYTICS] Saved cube to {args.save_cube}")
+
+    if not cube.days.size:
+        print("[ANALYTICS] No history")
+        return 0
+
+    first_day = datetime.fromtimestamp(int(cube.days[0]), history_store.KYIV_TZ).strftime('%Y-%m-%d')
+    last_day = datetime.fromtimestamp(int(cube.days[-1]), history_store.KYIV_TZ).strftime('%Y-%m-%d')
+    print(f"[ANALYTICS] {len(cube.queues)} queues x {len(cube.days)} days ({first_day} .. {last_day})")
+
+    hours = cube.hours_off()
+    _, weekly = cube.weekly_hours_off()
+    revisions = cube.revisions()
+    lead = cube.lead_hours()
+    days_with_data = cube.present.sum(axis=1)
+    with np.errstate(invalid="ignore"):
+        avg_daily = np.nanmean(hours, axis=1)
+        median_lead = np.nanmedian(lead, axis=1)
+
+    print(f"{'queue':8} {'days':>5} {'h/day':>6} {'h/week':>7} {'revisions/day':>14} {'lead h (median)':>16}")
+    for i, queue in enumerate(cube.queues.tolist()):
+        print(f"{queue:8} {days_with_data[i]:5d} {avg_daily[i]:6.1f} {weekly[i].mean():7.1f} "
+              f"{revisions[i].sum() / max(days_with_data[i], 1):14.2f} {median_lead[i]:16.1f}")
+
+    fairness = cube.fairness()
+    print(f"[ANALYTICS] Fairness: Jain {fairness['jain']:.3f}, CV {fairness['cv']:.3f}, "
+          f"spread {fairness['spread']:.1f} h")
+
+    if counters:
+        print("[ANALYTICS] Running counters (all time):")
+        for queue, c in counters.items():
+            print(f"  {queue:8} days {c['days']}, off {c['halfhours_off'] / 2:.1f} h, versions {c['versions']}, "
+                  f"revisions {c['revisions']}, mean lead {c['lead_seconds'] / max(c['days'], 1) / 3600:.1f} h")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
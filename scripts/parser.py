@@ -6,24 +6,61 @@ EIC значення прикриті через GitHub Secrets
 Трансформує дані в формат GPV
 Залишає тільки сьогодні та завтра
 """
+import argparse
+import base64
 import json
 import os
 import time
-import sys
-from datetime import datetime, timezone, timedelta
+from bisect import bisect_left, bisect_right
+from datetime import datetime, time as dt_time, timedelta
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+import glob
+import gzip
 import hashlib
+import random
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-def log(msg):
-    print(msg)
-    sys.stdout.flush()
+import logutil
+
+LOGGER = logutil.get_logger()
+log = LOGGER.info
 
 try:
     import cloudscraper
     log("OK: cloudscraper")
 except ImportError:
-    log("ERROR: cloudscraper not installed")
+    LOGGER.error("ERROR: cloudscraper not installed")
+    exit(1)
+
+try:
+    import slot_engine
+    log("OK: numpy")
+except ImportError:
+    LOGGER.error("ERROR: numpy not installed")
     exit(1)
 
+# Необов'язково: без brotli стиснуті артефакти даних пишуться тільки як .gz
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Необов'язково: шифрування збереженої сесії (ESVITLO_SESSION_KEY)
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+except ImportError:
+    Fernet = InvalidToken = None
+
+import delta_feed
+import history_store
+import http_replay
+import outage_analytics
+import slot_codec
+
 # 12 черг Вінниця (6 груп по 2 черги)
 QUEUE_MAPPING = {
     "1.1": "queue 1.1",
@@ -73,12 +110,21 @@ EICS = {
     "6.2": os.getenv("ESVITLO_EIC_6_2"),
 }
 
+# Відтворення HTTP з фікстур (див. http_replay.py) - без мережі та облікових даних
+REPLAY_DIR = os.getenv("ESVITLO_REPLAY_DIR")
+# Запис відповідей у фікстури під час звичайного запуску
+RECORD_DIR = os.getenv("ESVITLO_RECORD_DIR")
+
 # Перевірити що всі EIC задані
 missing_eics = [k for k, v in EICS.items() if not v]
-if missing_eics:
-    log("ERROR: Missing EIC secrets: " + str(missing_eics))
+if missing_eics and not REPLAY_DIR:
+    LOGGER.error("ERROR: Missing EIC secrets: " + str(missing_eics))
     exit(1)
 
+# Фікстури адресуються за ключем черги, тож при відтворенні EIC можуть бути умовними
+for k in missing_eics:
+    EICS[k] = "replay-" + k.replace(".", "-")
+
 # Побудувати QUEUE_URLS з прикритими EIC
 QUEUE_URLS = [
     f"https://vn.e-svitlo.com.ua/account_household/show_only_disconnections?eic={EICS['1.1']}&type_user=1&a=290637",
@@ -102,34 +148,247 @@ log("LOGIN: " + str(bool(LOGIN)))
 log("PASSWORD: " + str(bool(PASSWORD)))
 log("EICs loaded: " + str(len([v for v in EICS.values() if v])) + "/12")
 
-if not LOGIN or not PASSWORD:
-    log("ERROR: No credentials provided")
+if (not LOGIN or not PASSWORD) and not REPLAY_DIR:
+    LOGGER.error("ERROR: No credentials provided")
+    exit(1)
+
+BASE_URL = "https://vn.e-svitlo.com.ua/"
+LOGIN_URL = "https://vn.e-svitlo.com.ua/registr_all_user/login_all_user"
+CABINET_URL = "https://vn.e-svitlo.com.ua/account_household"
+
+# Параметри відтворення: затримка "0.2" або діапазон "0.1-0.5" сек, частка 503 / обривів з'єднання
+REPLAY_LATENCY = tuple(float(x) for x in os.getenv("ESVITLO_REPLAY_LATENCY", "0").split("-"))
+REPLAY_ERROR_RATE = float(os.getenv("ESVITLO_REPLAY_ERROR_RATE", "0"))
+REPLAY_DROP_RATE = float(os.getenv("ESVITLO_REPLAY_DROP_RATE", "0"))
+REPLAY_SEED = int(os.getenv("ESVITLO_REPLAY_SEED", "0"))
+
+# Скільки днів (починаючи з сьогодні) зберігати у fact.data
+HORIZON_DAYS = max(1, int(os.getenv("ESVITLO_HORIZON_DAYS", "2")))
+
+# Кількість паралельних запитів до черг (1 = послідовно; за замовчуванням усі черги одночасно)
+FETCH_CONCURRENCY = max(1, int(os.getenv("ESVITLO_CONCURRENCY", str(len(ALL_QUEUE_KEYS)))))
+
+# Спільний бюджет HTTP запитів до e-svitlo: запитів/сек та максимальний "сплеск"
+RATE_LIMIT_RPS = float(os.getenv("ESVITLO_RATE_RPS", "2"))
+RATE_LIMIT_BURST = int(os.getenv("ESVITLO_RATE_BURST", "12"))
+# 0 / від'ємне значення - ділення на нуль або нескінченне очікування в TokenBucket
+if not RATE_LIMIT_RPS > 0 or RATE_LIMIT_BURST < 1:
+    LOGGER.error(f"ERROR: ESVITLO_RATE_RPS must be > 0 and ESVITLO_RATE_BURST >= 1 "
+                 f"(got {RATE_LIMIT_RPS}, {RATE_LIMIT_BURST})")
     exit(1)
 
+# Повтори запитів черг: кількість спроб та експоненційна затримка з jitter (сек)
+FETCH_RETRIES = max(1, int(os.getenv("ESVITLO_RETRIES", "3")))
+RETRY_BASE_DELAY = float(os.getenv("ESVITLO_RETRY_BASE_DELAY", "1"))
+RETRY_MAX_DELAY = float(os.getenv("ESVITLO_RETRY_MAX_DELAY", "10"))
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+
+# Запобіжник: після стількох невдач поспіль запити не робляться BREAKER_COOLDOWN сек
+BREAKER_THRESHOLD = int(os.getenv("ESVITLO_BREAKER_THRESHOLD", "6"))
+BREAKER_COOLDOWN = int(os.getenv("ESVITLO_BREAKER_COOLDOWN", "300"))
+
+# Локальний кеш між запусками (сесія тощо); в GitHub Actions зберігається через actions/cache
+CACHE_DIR = os.getenv("ESVITLO_CACHE_DIR", ".cache")
+SESSION_CACHE_FILE = os.path.join(CACHE_DIR, "esvitlo_session.json")
+# Зашифрована сесія (Fernet, ключ - з секрету ESVITLO_SESSION_KEY): тільки вона може потрапити в actions/cache
+SESSION_ENCRYPTED_FILE = os.path.join(CACHE_DIR, "esvitlo_session.enc")
+SESSION_KEY = os.getenv("ESVITLO_SESSION_KEY", "")
+# У GitHub Actions кеш доступний іншим запускам репозиторію - cookies відкритим текстом не пишемо
+ON_CI = os.getenv("GITHUB_ACTIONS") == "true"
+QUEUE_CACHE_FILE = os.path.join(CACHE_DIR, "queue_state.json")
+TRANSFORM_CACHE_FILE = os.path.join(CACHE_DIR, "transform_state.json")
+# Історія розкладів (SQLite) - відновлюваний індекс журналу HISTORY_LOG; порожній рядок - не вести історію
+HISTORY_DB = os.getenv("ESVITLO_HISTORY_DB", os.path.join(CACHE_DIR, "history.sqlite"))
+# Версія кешу трансформації: змінювати при зміні алгоритму заповнення слотів
+TRANSFORM_CACHE_VERSION = 2
+
+DATA_DIR = "data"
+DATA_FILE = os.path.join(DATA_DIR, "Vinnytsiaoblenerho.json")
+# Стрічка змін розкладу (JSON Patch, один запис на рядок)
+DELTA_FEED_FILE = os.path.join(DATA_DIR, "Vinnytsiaoblenerho.deltas.jsonl")
+# Журнал історії розкладів (один рядок на нову версію, тільки доповнюється) - комітиться разом з даними
+HISTORY_LOG = os.path.join(DATA_DIR, "Vinnytsiaoblenerho.history.jsonl")
+# Попереднє розташування бази (комітилась у data/ - двійковий файл роздував історію git)
+LEGACY_HISTORY_DB = os.path.join(DATA_DIR, "history.sqlite")
+# Окремий файл на кожну чергу: data/Vinnytsiaoblenerho/GPV3.1.json
+QUEUE_DATA_DIR = os.path.join(DATA_DIR, "Vinnytsiaoblenerho")
+# Час останньої перевірки, коли розклад не змінився (файл даних тоді не перезаписується)
+HEARTBEAT_FILE = os.path.join(DATA_DIR, "Vinnytsiaoblenerho.heartbeat.json")
+# Мініфіковані та стиснуті копії даних з хешем у назві: Vinnytsiaoblenerho.<hash>.min.json[.gz|.br]
+ARTIFACT_PREFIX = os.path.join(DATA_DIR, "Vinnytsiaoblenerho.")
+ARTIFACT_HASH_LEN = 16
+
+IMAGES_DIR = os.path.join("images", "Vinnytsiaoblenerho")
+
+# Режим демона (--daemon): інтервали опитування в секундах
+POLL_MIN = int(os.getenv("ESVITLO_POLL_MIN", "120"))
+POLL_BASE = int(os.getenv("ESVITLO_POLL_BASE", "600"))
+POLL_MAX = int(os.getenv("ESVITLO_POLL_MAX", "1800"))
+POLL_AFTER_CHANGE = int(os.getenv("ESVITLO_POLL_AFTER_CHANGE", "1800"))
+# Вечірнє вікно (година Києва), коли зазвичай публікують графік на завтра
+POLL_EVENING_START = int(os.getenv("ESVITLO_POLL_EVENING_START", "17"))
+POLL_EVENING_END = int(os.getenv("ESVITLO_POLL_EVENING_END", "23"))
+
+# Код виходу, коли жодна черга не змінилась (workflow пропускає рендеринг)
+EXIT_UNCHANGED = 3
+
 # Kyiv timezone (UTC+2 in winter, UTC+3 in summer)
-KYIV_TZ = timezone(timedelta(hours=2))
+KYIV_TZ = ZoneInfo("Europe/Kyiv")
+
+@lru_cache(maxsize=8)
+def day_boundaries(first_day, days):
+    """Таблиця меж діб за Києвом: Unix timestamp півночі для days + 1 днів від first_day
+    
+    Доба триває 23, 24 або 25 годин залежно від переходу на літній/зимовий час
+    """
+    return tuple(
+        int(datetime.combine(first_day + timedelta(days=i), dt_time(), tzinfo=KYIV_TZ).timestamp())
+        for i in range(days + 1)
+    )
+
+def day_start_ts(kyiv_now):
+    """Unix timestamp початку поточної доби за Києвом"""
+    return day_boundaries(kyiv_now.date(), 1)[0]
+
+class TokenBucket:
+    """Потокобезпечний token bucket
+    
+    Поповнюється зі швидкістю rate токенів/сек до burst. Виклик acquire()
+    чекає тільки тоді, коли бюджет вичерпано.
+    """
+    
+    def __init__(self, rate, burst):
+        if not rate > 0 or burst < 1:
+            raise ValueError(f"TokenBucket needs rate > 0 and burst >= 1, got {rate}, {burst}")
+        self.rate = rate
+        self.burst = burst
+        self.waited = 0.0
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """Взяти один токен; повертає час очікування в секундах"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            
+            # Токен резервується одразу (баланс може стати від'ємним),
+            # тому паралельні виклики стають у чергу, а не змагаються
+            wait = max(0.0, (1 - self._tokens) / self.rate)
+            self._tokens -= 1
+            self.waited += wait
+        
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+RATE_LIMITER = TokenBucket(RATE_LIMIT_RPS, RATE_LIMIT_BURST)
+
+def rate_limit_hook(scraper, method, url, *args, **kwargs):
+    """requestPreHook cloudscraper: кожен запит (включно з CF challenge) проходить через RATE_LIMITER"""
+    RATE_LIMITER.acquire()
+    return method, url, args, kwargs
+
+class CircuitBreaker:
+    """Запобіжник для upstream, що явно лежить
+    
+    Після threshold послідовних невдач запити не робляться cooldown секунд,
+    потім пропускається одна пробна спроба (half-open).
+    """
+    
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+    
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if time.monotonic() - self._opened_at >= self.cooldown:
+                # Half-open: пропускаємо одну спробу, наступна невдача знову відкриє
+                self._opened_at = None
+                self._failures = self.threshold - 1
+                return True
+            return False
+    
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+    
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.threshold and self._opened_at is None:
+                self._opened_at = time.monotonic()
+                LOGGER.warning(f"[BREAKER] Open after {self._failures} consecutive failures, cooldown {self.cooldown}s")
+
+CIRCUIT_BREAKER = CircuitBreaker(BREAKER_THRESHOLD, BREAKER_COOLDOWN)
+
+def backoff_delay(attempt):
+    """Експоненційна затримка з повним jitter для спроби attempt (1, 2, ...)"""
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1)))
+
+def fixture_name(method, url):
+    """Логічна назва запиту для record/replay (без EIC у назві)"""
+    if url in QUEUE_FIXTURE_NAMES:
+        return QUEUE_FIXTURE_NAMES[url]
+    if url == BASE_URL:
+        return "warmup"
+    if url.startswith(LOGIN_URL):
+        return "login"
+    if url.startswith(CABINET_URL):
+        return "cabinet"
+    return "other-" + url.split("?")[0].rstrip("/").rsplit("/", 1)[-1]
+
+QUEUE_FIXTURE_NAMES = {url: "queue-" + queue_key for queue_key, url in zip(ALL_QUEUE_KEYS, QUEUE_URLS)}
 
 def create_scraper():
     """Створити scraper з anti-Cloudflare headers"""
-    scraper = cloudscraper.create_scraper()
+    hooks = {"requestPreHook": rate_limit_hook}
+    if RECORD_DIR:
+        log("[RECORD] Saving responses to " + RECORD_DIR)
+        hooks["requestPostHook"] = http_replay.Recorder(RECORD_DIR, fixture_name).hook
+    
+    scraper = cloudscraper.create_scraper(**hooks)
     scraper.headers.update({
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
         'Accept': 'application/json',
         'Accept-Language': 'uk,ru;q=0.9,en-US;q=0.8,en;q=0.7',
     })
+    
+    if REPLAY_DIR:
+        log("[REPLAY] Serving responses from " + REPLAY_DIR)
+        scraper.mount("https://", http_replay.ReplayAdapter(
+            REPLAY_DIR, fixture_name,
+            latency=REPLAY_LATENCY if len(REPLAY_LATENCY) > 1 else REPLAY_LATENCY[0],
+            error_rate=REPLAY_ERROR_RATE, drop_rate=REPLAY_DROP_RATE, seed=REPLAY_SEED,
+        ))
+        return scraper
+    
+    # Пул keep-alive з'єднань під кількість потоків (адаптер cloudscraper зберігає свій TLS контекст)
+    adapter = scraper.get_adapter("https://")
+    adapter.init_poolmanager(FETCH_CONCURRENCY, FETCH_CONCURRENCY, block=True)
     return scraper
 
+def is_authenticated(resp):
+    """Чи відповідь сторінки належить залогіненому користувачу"""
+    return "Вихід" in resp.text or "logout" in resp.text.lower()
+
 def login(scraper):
     """Залогінитися на e-svitlo.com.ua"""
     log("[LOGIN] Starting authentication")
     
     try:
-        cf = scraper.get("https://vn.e-svitlo.com.ua/", timeout=30)
+        cf = scraper.get(BASE_URL, timeout=30)
         log("[LOGIN] CF challenge: " + str(cf.status_code))
     except Exception as e:
-        log("[LOGIN] CF error: " + str(e))
-    
-    time.sleep(1)
+        LOGGER.warning("[LOGIN] CF error: " + str(e))
     
     data = {
         "email": LOGIN,
@@ -143,7 +402,7 @@ def login(scraper):
     }
     
     resp = scraper.post(
-        "https://vn.e-svitlo.com.ua/registr_all_user/login_all_user",
+        LOGIN_URL,
         data=data,
         headers=headers,
         allow_redirects=True,
@@ -151,57 +410,279 @@ def login(scraper):
     )
     
     log("[LOGIN] Response: " + str(resp.status_code))
-    log("[LOGIN] URL: " + resp.url)
+    LOGGER.debug("[LOGIN] URL: %s", resp.url)
     
-    is_logged_in = "Вихід" in resp.text or "logout" in resp.text.lower()
+    is_logged_in = is_authenticated(resp)
     log("[LOGIN] Authenticated: " + str(is_logged_in))
     
-    time.sleep(2)
     return scraper
 
 def activate_session(scraper):
     """Активувати сесію перед парсингом черг"""
     log("[SESSION] Activating session")
     try:
-        cabinet_response = scraper.get("https://vn.e-svitlo.com.ua/account_household", timeout=30, allow_redirects=True)
+        cabinet_response = scraper.get(CABINET_URL, timeout=30, allow_redirects=True)
         log("[SESSION] Cabinet status: " + str(cabinet_response.status_code))
         
         cookies_dict = scraper.cookies.get_dict()
-        log("[SESSION] Cookies: " + str(len(cookies_dict)))
+        LOGGER.debug("[SESSION] Cookies: %d", len(cookies_dict))
+    except Exception as e:
+        LOGGER.warning("[SESSION] Error: " + str(e))
+
+def session_cipher():
+    """Fernet з ключем, похідним від ESVITLO_SESSION_KEY (None - шифрування не налаштоване)"""
+    if not SESSION_KEY or Fernet is None:
+        return None
+    key = hashlib.pbkdf2_hmac("sha256", SESSION_KEY.encode("utf-8"), b"esvitlo-session", 200_000)
+    return Fernet(base64.urlsafe_b64encode(key))
+
+def session_cache_path():
+    """Файл сесії: зашифрований, відкритий (0600, тільки локально) або None - не зберігати"""
+    if session_cipher() is not None:
+        return SESSION_ENCRYPTED_FILE
+    if SESSION_KEY:
+        LOGGER.warning("[SESSION] ESVITLO_SESSION_KEY is set but cryptography is not installed, session not cached")
+        return None
+    if ON_CI:
+        return None
+    return SESSION_CACHE_FILE
+
+def load_session(scraper):
+    """Відновити cookies (включно з Cloudflare clearance) з кешу
+    
+    Повертає лічильники hit/miss з попередніх запусків
+    """
+    stats = {"hits": 0, "misses": 0}
+    path = session_cache_path()
+    if path is None or not os.path.exists(path):
+        return stats, False
+    
+    try:
+        with open(path, "rb") as f:
+            raw = f.read()
+        if path == SESSION_ENCRYPTED_FILE:
+            try:
+                raw = session_cipher().decrypt(raw)
+            except InvalidToken:
+                LOGGER.warning("[SESSION] Cache decrypt error (key changed?), logging in")
+                return stats, False
+        cached = json.loads(raw.decode("utf-8"))
         
-        time.sleep(1)
+        stats.update(cached.get("stats", {}))
+        if cached.get("user_agent"):
+            scraper.headers['User-Agent'] = cached["user_agent"]
+        for c in cached.get("cookies", []):
+            scraper.cookies.set(c["name"], c["value"], domain=c["domain"], path=c["path"],
+                                expires=c.get("expires"), secure=c.get("secure", False))
+        return stats, bool(cached.get("cookies"))
+    except Exception as e:
+        LOGGER.warning("[SESSION] Cache read error: " + str(e))
+        return stats, False
+
+def save_session(scraper, stats):
+    """Зберегти cookies сесії на диск (файл доступний лише власнику)
+    
+    З ESVITLO_SESSION_KEY - зашифровано; у CI без ключа сесія не зберігається
+    (кожен запуск логіниться заново)
+    """
+    path = session_cache_path()
+    if path is None:
+        return
+    
+    cached = {
+        "saved_at": int(time.time()),
+        "user_agent": scraper.headers.get('User-Agent'),
+        "cookies": [
+            {
+                "name": c.name,
+                "value": c.value,
+                "domain": c.domain,
+                "path": c.path,
+                "expires": c.expires,
+                "secure": c.secure,
+            }
+            for c in scraper.cookies
+        ],
+        "stats": stats,
+    }
+    
+    try:
+        os.makedirs(CACHE_DIR, mode=0o700, exist_ok=True)
+        payload = json.dumps(cached, ensure_ascii=False).encode("utf-8")
+        if path == SESSION_ENCRYPTED_FILE:
+            payload = session_cipher().encrypt(payload)
+        write_bytes_atomic(path, payload, mode=0o600)
+    except Exception as e:
+        LOGGER.warning("[SESSION] Cache write error: " + str(e))
+
+def session_is_valid(scraper):
+    """Перевірити збережену сесію одним запитом до кабінету"""
+    try:
+        resp = scraper.get(CABINET_URL, timeout=30, allow_redirects=False)
+        log("[SESSION] Check status: " + str(resp.status_code))
+        return resp.status_code == 200 and is_authenticated(resp)
     except Exception as e:
-        log("[SESSION] Error: " + str(e))
+        LOGGER.warning("[SESSION] Check error: " + str(e))
+        return False
+
+def ensure_session(scraper):
+    """Використати збережену сесію або пройти повний логін"""
+    stats, restored = load_session(scraper)
+    
+    if restored and session_is_valid(scraper):
+        stats["hits"] += 1
+        log(f"[SESSION] Cache hit (hits: {stats['hits']}, misses: {stats['misses']})")
+    else:
+        stats["misses"] += 1
+        log(f"[SESSION] Cache miss (hits: {stats['hits']}, misses: {stats['misses']})")
+        scraper.cookies.clear()
+        with LOGGER.span("login"):
+            login(scraper)
+            activate_session(scraper)
+    
+    save_session(scraper, stats)
+    return stats
 
 def get_queue_name(queue_key):
     """Отримати назву черги за ключем"""
     return QUEUE_MAPPING.get(queue_key, "unknown")
 
-def parse_queue(scraper, url, queue_key, queue_idx):
-    """Парсити одну чергу"""
+def outages_fingerprint(outages):
+    """Хеш нормалізованого planned_list_cab (тільки поля, що йдуть у трансформацію)"""
+    normalized = sorted((o['acc_begin'], o['accend_plan'], str(o['typeid'])) for o in outages)
+    return calculate_hash(json.dumps(normalized, ensure_ascii=False))
+
+def write_json_atomic(path, data, mode=0o644, **dump_kwargs):
+    """Записати JSON через тимчасовий файл у тій самій папці та os.replace
+    
+    Читачі бачать або старий, або новий файл повністю, ніколи - напівзаписаний
+    """
+    write_bytes_atomic(path, json.dumps(data, ensure_ascii=False, **dump_kwargs).encode("utf-8"), mode)
+
+def write_bytes_atomic(path, payload, mode=0o644):
+    """Атомарний запис байтів (див. write_json_atomic)"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".",
+                                    prefix="." + os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+def load_queue_cache():
+    """Завантажити кеш відповідей черг з попереднього запуску"""
+    if not os.path.exists(QUEUE_CACHE_FILE):
+        return {}
+    try:
+        with open(QUEUE_CACHE_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        LOGGER.warning("[CACHE] Read error: " + str(e))
+        return {}
+
+def save_queue_cache(cache):
+    """Зберегти кеш відповідей черг"""
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        write_json_atomic(QUEUE_CACHE_FILE, cache)
+    except Exception as e:
+        LOGGER.warning("[CACHE] Write error: " + str(e))
+
+def load_transform_cache():
+    """Завантажити мемоізовані розклади (день/черга) з попереднього запуску"""
+    if not os.path.exists(TRANSFORM_CACHE_FILE):
+        return {}
+    try:
+        with open(TRANSFORM_CACHE_FILE, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+        if cache.get("version") != TRANSFORM_CACHE_VERSION:
+            return {}
+        return cache.get("buckets", {})
+    except Exception as e:
+        LOGGER.warning("[CACHE] Transform cache read error: " + str(e))
+        return {}
+
+def save_transform_cache(buckets):
+    """Зберегти мемоізовані розклади (день/черга)"""
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        write_json_atomic(TRANSFORM_CACHE_FILE, {"version": TRANSFORM_CACHE_VERSION, "buckets": buckets})
+    except Exception as e:
+        LOGGER.warning("[CACHE] Transform cache write error: " + str(e))
+
+def parse_queue(scraper, url, queue_key, queue_idx, cached=None):
+    """Парсити одну чергу
+    
+    Повертає (outages, entry), де entry - новий запис кешу черги
+    (fingerprint, ETag/Last-Modified, час отримання та outages) або None,
+    якщо всі спроби невдалі. Якщо сервер відповів 304, повертається
+    закешований запис.
+    """
     try:
-        time.sleep(1)
-        
         queue_name = get_queue_name(queue_key)
         
-        log("[Q" + str(queue_idx) + "] " + queue_name + " Fetching...")
+        LOGGER.debug("[Q%d] %s Fetching...", queue_idx, queue_name)
+        
+        # Умовний запит, якщо сервер раніше віддав ETag / Last-Modified
+        headers = {}
+        if cached:
+            if cached.get('etag'):
+                headers['If-None-Match'] = cached['etag']
+            if cached.get('last_modified'):
+                headers['If-Modified-Since'] = cached['last_modified']
         
-        response = scraper.get(url, timeout=30, allow_redirects=True)
+        # Повтори з експоненційною затримкою для мережевих помилок, 429 та 5xx
+        for attempt in range(1, FETCH_RETRIES + 1):
+            if not CIRCUIT_BREAKER.allow():
+                log("[Q" + str(queue_idx) + "] Circuit open, skipping request")
+                return [], None
+            
+            try:
+                response = scraper.get(url, headers=headers, timeout=30, allow_redirects=True)
+                log("[Q" + str(queue_idx) + "] Status: " + str(response.status_code))
+            except Exception as e:
+                LOGGER.warning("[Q" + str(queue_idx) + "] Request error: " + str(e)[:100])
+                response = None
+            
+            if response is not None and response.status_code not in RETRYABLE_STATUSES:
+                break
+            
+            CIRCUIT_BREAKER.record_failure()
+            if attempt < FETCH_RETRIES:
+                delay = backoff_delay(attempt)
+                LOGGER.warning(f"[Q{queue_idx}] Retry {attempt}/{FETCH_RETRIES - 1} in {delay:.1f}s")
+                time.sleep(delay)
+        else:
+            LOGGER.error("[Q" + str(queue_idx) + "] ERROR: All " + str(FETCH_RETRIES) + " attempts failed")
+            return [], None
         
-        log("[Q" + str(queue_idx) + "] Status: " + str(response.status_code))
+        if response.status_code == 304 and cached:
+            CIRCUIT_BREAKER.record_success()
+            log("[Q" + str(queue_idx) + "] Not modified, using cached " + str(len(cached['outages'])) + " records")
+            return cached['outages'], dict(cached, fetched_at=int(time.time()))
         
         if response.status_code != 200:
-            log("[Q" + str(queue_idx) + "] ERROR: Status " + str(response.status_code))
-            return []
+            CIRCUIT_BREAKER.record_failure()
+            LOGGER.error("[Q" + str(queue_idx) + "] ERROR: Status " + str(response.status_code))
+            return [], None
         
         try:
             data = json.loads(response.text)
         except json.JSONDecodeError as e:
-            log("[Q" + str(queue_idx) + "] JSON decode error: " + str(e))
-            return []
+            CIRCUIT_BREAKER.record_failure()
+            LOGGER.error("[Q" + str(queue_idx) + "] JSON decode error: " + str(e))
+            return [], None
+        
+        CIRCUIT_BREAKER.record_success()
         
         planned_list = data.get('planned_list_cab', [])
-        log("[Q" + str(queue_idx) + "] Found: " + str(len(planned_list)) + " outages")
+        LOGGER.debug("[Q%d] Found: %d outages", queue_idx, len(planned_list))
         
         outages = []
         for item in planned_list:
@@ -217,158 +698,470 @@ def parse_queue(scraper, url, queue_key, queue_idx):
                 })
         
         log("[Q" + str(queue_idx) + "] Parsed: " + str(len(outages)) + " records")
-        return outages
+        
+        entry = {
+            'fingerprint': outages_fingerprint(outages),
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'fetched_at': int(time.time()),
+            'outages': outages,
+        }
+        return outages, entry
         
     except Exception as e:
-        log("[Q" + str(queue_idx) + "] EXCEPTION: " + str(e)[:100])
-        return []
+        LOGGER.error("[Q" + str(queue_idx) + "] EXCEPTION: " + str(e)[:100])
+        return [], None
 
-def round_minutes_to_half_hour(minutes):
-    """Округлює хвилини до половини години
+def fetch_all_queues(scraper, queue_cache=None, concurrency=FETCH_CONCURRENCY):
+    """Парсити всі черги пулом потоків зі спільною сесією
     
-    < 30 хвилин → 0 (XX:00)
-    >= 30 хвилин → 30 (XX:30)
+    Результати (outages, entry) повертаються в порядку ALL_QUEUE_KEYS
     """
-    return 30 if minutes >= 30 else 0
-
-def hour_to_slot(hour):
-    """Конвертує годину в номер часового слота (1-24)
+    queue_cache = queue_cache or {}
+    jobs = [(url, queue_key, idx, queue_cache.get(queue_key))
+            for idx, (queue_key, url) in enumerate(zip(ALL_QUEUE_KEYS, QUEUE_URLS), 1)]
+    started = time.monotonic()
     
-    Слот N охоплює годину від (N-1):00 до N:00
-    Приклад: слот 7 = 6:00-7:00, слот 1 = 0:00-1:00
-    """
-    if hour == 0:
-        return 1
+    def fetch(job):
+        with LOGGER.span("fetch", queue=job[1]):
+            return parse_queue(scraper, *job)
+    
+    if concurrency <= 1:
+        results = [fetch(job) for job in jobs]
     else:
-        return hour + 1
-
-def create_empty_slots():
-    """Створює порожні слоти (всі = yes)"""
-    return {str(i): "yes" for i in range(1, 25)}
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(fetch, jobs))
+    
+    log(f"[FETCH] {len(jobs)} queues in {time.monotonic() - started:.2f}s (concurrency: {concurrency}, "
+        f"rate limit wait: {RATE_LIMITER.waited:.2f}s total)")
+    return results
 
-def transform_to_gpv(all_outages, kyiv_now):
+def transform_to_gpv(all_outages, kyiv_now, uncached_queues=()):
     """Трансформує дані в GPV формат
     
-    Залишає ТІЛЬКИ сьогодні та завтра
+    Залишає тільки HORIZON_DAYS днів, починаючи з сьогодні (за замовчуванням сьогодні та завтра)
     Округлює хвилини до половини години для розрахунку слотів
+    Повертає (fact_data, маски slot_codec {"день/GPV": маска},
+    хвилинна шкала {день: {GPV: [[початок, кінець], ...]}},
+    відсортовані ключі "день/GPV", що перераховані в цьому запуску)
+    
+    Результат кожної комірки (день × черга) мемоізується за відбитком її
+    вимкнень у TRANSFORM_CACHE_FILE; незмінені комірки не перераховуються.
+    Комірки uncached_queues (черги без відповіді) не мемоізуються: наступний запуск перерахує їх
     """
     log("[TRANSFORM] Starting transformation to GPV format")
     
-    # Отримуємо сьогодні та завтра як Unix timestamps (в Kyiv timezone)
-    today_date = kyiv_now.replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=KYIV_TZ)
-    tomorrow_date = today_date + timedelta(days=1)
+    # Межі діб горизонту як Unix timestamps (реальні півночі Europe/Kyiv)
+    bounds = day_boundaries(kyiv_now.date(), HORIZON_DAYS)
+    day_keys = bounds[:-1]
     
-    today_ts = int(today_date.timestamp())
-    tomorrow_ts = int(tomorrow_date.timestamp())
+    log(f"[TRANSFORM] Horizon: {HORIZON_DAYS} days from {day_keys[0]} to {bounds[-1]}")
     
-    log(f"[TRANSFORM] Today: {today_ts} ({today_date}), Tomorrow: {tomorrow_ts} ({tomorrow_date})")
+    queue_index = {queue_key: i for i, queue_key in enumerate(ALL_QUEUE_KEYS)}
     
-    # Групуємо вимкнення за датою та чергою
-    outages_by_date_queue = {}
+    # Колонки для рушія: комірка (день × черга) та інтервал у хвилинах від початку доби
+    cells = []
+    start_mins = []
+    end_mins = []
+    seen = set()
     
     for outage in all_outages:
         try:
             begin_str = outage['acc_begin']
             end_str = outage['accend_plan']
             
+            queue_idx = queue_index.get(outage['queue_key'])
+            if queue_idx is None:
+                continue
+            
+            # Однакові записи (дублікати з API) парсимо один раз
+            record_key = (queue_idx, begin_str, end_str)
+            if record_key in seen:
+                continue
+            seen.add(record_key)
+            
             # Парсимо ISO datetime
             # КРИТИЧНО: дані без таймзони, припускаємо Kyiv timezone
             begin_dt = datetime.fromisoformat(begin_str).replace(tzinfo=KYIV_TZ)
             end_dt = datetime.fromisoformat(end_str).replace(tzinfo=KYIV_TZ)
+            end_ts = end_dt.timestamp()
             
-            # Отримуємо дату як Unix timestamp
-            date_only = begin_dt.replace(hour=0, minute=0, second=0, microsecond=0)
-            unix_ts = int(date_only.timestamp())
-            
-            log(f"[TRANSFORM] Outage: {begin_str} → Date TS: {unix_ts}")
-            
-            # ФІЛЬТРУЄМО: залишаємо тільки сьогодні та завтра
-            if unix_ts not in [today_ts, tomorrow_ts]:
-                log(f"[TRANSFORM] Skipping outage from {unix_ts} (not today or tomorrow)")
-                continue
-            
-            if unix_ts not in outages_by_date_queue:
-                outages_by_date_queue[unix_ts] = {}
-            
-            queue_key = outage['queue_key']
-            
-            if queue_key not in outages_by_date_queue[unix_ts]:
-                outages_by_date_queue[unix_ts][queue_key] = []
+            # Доба початку та кінця - бінарним пошуком у таблиці меж
+            first_day = bisect_right(bounds, begin_dt.timestamp()) - 1
+            if end_dt > begin_dt:
+                last_day = bisect_left(bounds, end_ts) - 1
+            else:
+                # Вироджений запис (кінець не пізніше початку) - відкидається при нормалізації
+                last_day = first_day
             
-            outages_by_date_queue[unix_ts][queue_key].append({
-                'start_hour': begin_dt.hour,
-                'start_minute': begin_dt.minute,
-                'end_hour': end_dt.hour,
-                'end_minute': end_dt.minute,
-            })
+            LOGGER.debug("[TRANSFORM] Outage: %s - %s → days %d..%d", begin_str, end_str, first_day, last_day)
             
-            log(f"[TRANSFORM] Parsed: {begin_dt.hour:02d}:{begin_dt.minute:02d} - {end_dt.hour:02d}:{end_dt.minute:02d}")
+            # ФІЛЬТРУЄМО: залишаємо тільки дні горизонту, вимкнення через північ розбиваємо по добах
+            for day_idx in range(max(first_day, 0), min(last_day, len(day_keys) - 1) + 1):
+                # Частина, що починається з півночі - з 00:00; що триває до півночі - до кінця доби
+                start = begin_dt.hour * 60 + begin_dt.minute if day_idx == first_day else 0
+                if day_idx == last_day and end_ts < bounds[day_idx + 1]:
+                    end = end_dt.hour * 60 + end_dt.minute
+                else:
+                    end = slot_engine.MINUTES_PER_DAY
+                
+                cells.append(day_idx * len(ALL_QUEUE_KEYS) + queue_idx)
+                start_mins.append(start)
+                # 23:59 - кінець дня
+                end_mins.append(slot_engine.MINUTES_PER_DAY if end >= slot_engine.MINUTES_PER_DAY - 1 else end)
             
         except Exception as e:
-            log("[TRANSFORM] Error processing outage: " + str(e))
+            LOGGER.warning("[TRANSFORM] Error processing outage: " + str(e))
     
-    # Збудуємо структуру з гарантією сьогодні + завтра
-    fact_data = {}
+    # Відбиток кожної комірки - відсортовані інтервали її вимкнень
+    pieces = {}
+    for cell, start, end in zip(cells, start_mins, end_mins):
+        pieces.setdefault(cell, []).append((start, end))
+    
+    cell_keys = [f"{unix_ts}/{QUEUE_TO_GPV[queue_key]}" for unix_ts in day_keys for queue_key in ALL_QUEUE_KEYS]
+    fingerprints = [calculate_hash(json.dumps(sorted(pieces.get(cell, [])))) for cell in range(len(cell_keys))]
+    
+    cache = load_transform_cache()
+    dirty = {cell for cell, key in enumerate(cell_keys)
+             if cache.get(key, {}).get("fingerprint") != fingerprints[cell]}
+    
+    # Перераховуються тільки змінені комірки
+    # Злиття перекритих та суміжних інтервалів: фарбується тільки кожен окремий проміжок
+    selected = [i for i, cell in enumerate(cells) if cell in dirty]
+    cells, start_mins, end_mins = slot_engine.normalize_intervals(
+        [cells[i] for i in selected], [start_mins[i] for i in selected], [end_mins[i] for i in selected])
     
-    for unix_ts in [today_ts, tomorrow_ts]:
+    # Усі черги × дні одним масивом, заповнення інтервалів - векторними операціями
+    codes = slot_engine.paint_intervals(cells, start_mins, end_mins, len(cell_keys))
+    log(f"[TRANSFORM] Painted {len(cells)} intervals from {len(seen)} outages "
+        f"into {len(dirty)} of {len(day_keys)}x{len(ALL_QUEUE_KEYS)} schedules")
+    
+    # Словники GPV - тільки на етапі серіалізації; для хешування та порівняння - компактні маски
+    masks = slot_engine.to_masks(codes)
+    
+    # Точні злиті інтервали (хвилини від початку доби, 1440 - кінець доби) - без округлення
+    intervals = {}
+    for cell, start, end in zip(cells.tolist(), start_mins.tolist(), end_mins.tolist()):
+        intervals.setdefault(cell, []).append([start, end])
+    
+    buckets = {}
+    for cell, key in enumerate(cell_keys):
+        if cell in dirty:
+            buckets[key] = {
+                "fingerprint": fingerprints[cell],
+                "slots": slot_engine.to_gpv_slots(codes[cell]),
+                "mask": int(masks[cell]),
+                "timeline": intervals.get(cell, []),
+            }
+        else:
+            buckets[key] = cache[key]
+    uncached = {QUEUE_TO_GPV[k] for k in uncached_queues}
+    save_transform_cache({key: bucket for key, bucket in buckets.items() if key.split("/")[1] not in uncached})
+    
+    dirty_keys = sorted(cell_keys[cell] for cell in dirty)
+    log("[TRANSFORM] Dirty schedules: " + (", ".join(dirty_keys) or "none"))
+    
+    fact_data = {}
+    fact_masks = {}
+    fact_timeline = {}
+    for unix_ts in day_keys:
         fact_data[str(unix_ts)] = {}
-        
+        fact_timeline[str(unix_ts)] = {}
         for queue_key in ALL_QUEUE_KEYS:
-            gpv_key = QUEUE_TO_GPV.get(queue_key)
-            
-            # Ініціалізуємо всі слоти як "yes"
-            slots = create_empty_slots()
-            
-            # Якщо є вимкнення для цієї черги в цей день
-            if unix_ts in outages_by_date_queue and queue_key in outages_by_date_queue[unix_ts]:
-                for outage in outages_by_date_queue[unix_ts][queue_key]:
-                    start_hour = outage['start_hour']
-                    start_minute = outage['start_minute']
-                    end_hour = outage['end_hour']
-                    end_minute = outage['end_minute']
-                    
-                    # Конвертуємо години в слоти
-                    start_slot = hour_to_slot(start_hour)
-                    
-                    # Округлюємо кінцеві хвилини
-                    rounded_end_minute = round_minutes_to_half_hour(end_minute)
-                    
-                    # Якщо після округлення = 30, вимкнення йде до наступної години
-                    if rounded_end_minute == 30:
-                        actual_end_hour = end_hour + 1
-                    else:
-                        actual_end_hour = end_hour
-                    
-                    end_slot = hour_to_slot(actual_end_hour)
-                    
-                    log(f"[TRANSFORM] {gpv_key} ({unix_ts}): {start_hour:02d}:{start_minute:02d}-{end_hour:02d}:{end_minute:02d} → слоти {start_slot}-{end_slot-1}")
-                    
-                    # Заповнюємо слоти з "no"
-                    for slot in range(start_slot, end_slot):
-                        if slot <= 24:
-                            slots[str(slot)] = "no"
-                    
-                    # Логіка first/second
-                    # 'second': якщо acc_begin має дробову частину (start_minute ≠ 0)
-                    if start_minute != 0 and start_slot <= 24:
-                        slots[str(start_slot)] = "second"
-                    
-                    # 'first': якщо accend_plan має дробову частину (end_minute ≠ 0)
-                    # НЕ враховуємо 23:59:59 (кінець дня)
-                    if end_minute != 0 and end_slot - 1 <= 24:
-                        if not (end_hour == 23 and end_minute == 59):
-                            slots[str(end_slot - 1)] = "first"
-            
-            fact_data[str(unix_ts)][gpv_key] = slots
+            gpv_key = QUEUE_TO_GPV[queue_key]
+            bucket = buckets[f"{unix_ts}/{gpv_key}"]
+            fact_data[str(unix_ts)][gpv_key] = bucket["slots"]
+            fact_masks[f"{unix_ts}/{gpv_key}"] = bucket["mask"]
+            fact_timeline[str(unix_ts)][gpv_key] = bucket["timeline"]
     
-    return fact_data
+    return fact_data, fact_masks, fact_timeline, dirty_keys
 
 def calculate_hash(data_str):
     """Розраховує SHA256 хеш даних"""
     return hashlib.sha256(data_str.encode()).hexdigest()
 
-def save_results(all_outages):
-    """Зберегти результати у JSON GPV формат"""
+def load_previous_data():
+    """Попередній файл даних (порожньо, якщо файлу немає або він пошкоджений)"""
+    if not os.path.exists(DATA_FILE):
+        return {}
+    try:
+        with open(DATA_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception as e:
+        LOGGER.warning("[SAVE] Could not read previous data: " + str(e))
+        return {}
+
+def fill_missing_queues(fact_data, fact_masks, fact_timeline, previous_data, missing):
+    """Розклади черг без відповіді та без кешу - з попереднього файлу даних (на місці)
+    
+    Порожній розклад (усі "yes") був би хибним "світло весь день", тому день, якого
+    в попередньому файлі немає, і черга без попередніх даних взагалі - не публікуються.
+    Повертає (застарілі черги {черга: з якого часу дані}, черги, яких немає в fact)
+    """
+    prev_fact = previous_data.get("fact", {})
+    prev_stale = previous_data.get("lastUpdateStatus", {}).get("stale", {})
+    stale = {}
+    absent = []
+    for queue_key in missing:
+        gpv_key = QUEUE_TO_GPV[queue_key]
+        found = False
+        for day, queues in fact_data.items():
+            prev_slots = prev_fact.get("data", {}).get(day, {}).get(gpv_key)
+            if prev_slots is None:
+                del queues[gpv_key]
+                del fact_masks[f"{day}/{gpv_key}"]
+                del fact_timeline[day][gpv_key]
+                continue
+            queues[gpv_key] = prev_slots
+            fact_masks[f"{day}/{gpv_key}"] = slot_codec.encode_slots(prev_slots)
+            fact_timeline[day][gpv_key] = prev_fact.get("timeline", {}).get(day, {}).get(gpv_key, [])
+            found = True
+        
+        if found:
+            # Дані черги - з того ж часу, що й у попередньому файлі (якщо вже там були застарілими)
+            stale[queue_key] = prev_stale.get(gpv_key, {}).get("since") or previous_data.get("lastUpdated")
+            log(f"[SAVE] {queue_key}: using schedule from previous data file ({stale[queue_key]})")
+        else:
+            absent.append(queue_key)
+            LOGGER.warning(f"[SAVE] {queue_key}: no data at all, queue left out of the schedule")
+    return stale, absent
+
+def log_schedule_changes(fact_masks, previous_data):
+    """Вивести, які розклади (день/черга) змінились відносно попереднього файлу"""
+    previous = slot_codec.encode_fact_data(previous_data.get('fact', {}).get('data', {}))
+    changes = []
+    for key, mask in fact_masks.items():
+        if key not in previous:
+            changes.append(key + " (new)")
+        elif previous[key] != mask:
+            changes.append(key + " slots " + ",".join(map(str, slot_codec.changed_slots(previous[key], mask))))
+    log("[SAVE] Changed schedules: " + ("; ".join(changes) or "none"))
+
+def build_update_status(last_updated_ts, stale=None, missing=None):
+    """Статус оновлення з переліком черг, взятих з кешу (stale) або відсутніх (missing)"""
+    stale = stale or {}
+    missing = missing or []
+    
+    message = None
+    if stale or missing:
+        parts = []
+        if stale:
+            parts.append("stale: " + ", ".join(QUEUE_TO_GPV[k] for k in stale))
+        if missing:
+            parts.append("missing: " + ", ".join(QUEUE_TO_GPV[k] for k in missing))
+        message = "; ".join(parts)
+    
+    return {
+        "status": "partial" if stale or missing else "parsed",
+        "ok": not missing,
+        "code": 200,
+        "message": message,
+        "at": last_updated_ts,
+        "attempt": 1,
+        # Для кожної застарілої черги - коли дані були отримані востаннє
+        "stale": {
+            QUEUE_TO_GPV[k]: {"since": since, "ageSeconds": last_updated_ts - since if since else None}
+            for k, since in stale.items()
+        },
+        "missing": [QUEUE_TO_GPV[k] for k in missing],
+    }
+
+def artifact_payload(result):
+    """Мініфікований JSON для артефактів: дані без meta.artifacts (посилань на самі артефакти)"""
+    meta = {key: value for key, value in result["meta"].items() if key != "artifacts"}
+    return json.dumps(dict(result, meta=meta), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def artifact_names(payload):
+    """Назви мініфікованого та стиснутих файлів - за SHA256 самих байтів payload
+    
+    Назва однозначно визначає вміст (включно з lastUpdated, lastUpdateStatus, deltaSeq),
+    тому файл можна кешувати назавжди
+    """
+    base = os.path.basename(ARTIFACT_PREFIX) + hashlib.sha256(payload).hexdigest()[:ARTIFACT_HASH_LEN] + ".min.json"
+    names = {"min": base, "gzip": base + ".gz"}
+    if brotli is not None:
+        names["brotli"] = base + ".br"
+    return names
+
+def decompress_artifact(kind, data):
+    """Вміст артефакту без стиснення (для порівняння з payload)"""
+    if kind == "gzip":
+        return gzip.decompress(data)
+    if kind == "brotli":
+        return brotli.decompress(data)
+    return data
+
+def write_artifacts(payload, names):
+    """Записати мініфікований JSON та стиснуті копії (.gz, .br)
+    
+    Наявний файл з тією самою назвою не перезаписується: якщо його вміст інший,
+    це порушення "одна назва - один вміст", і збереження зупиняється
+    """
+    files = {
+        "min": payload,
+        # mtime=0 - однаковий вміст дає однакові байти
+        "gzip": gzip.compress(payload, compresslevel=9, mtime=0),
+    }
+    if "brotli" in names:
+        files["brotli"] = brotli.compress(payload, quality=11)
+    
+    for kind, data in files.items():
+        path = os.path.join(DATA_DIR, names[kind])
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                existing = f.read()
+            try:
+                same = decompress_artifact(kind, existing) == payload
+            except Exception:
+                same = False
+            if not same:
+                raise RuntimeError(f"Artifact {names[kind]} already exists with different content")
+            # Той самий вміст - файл не перезаписуємо
+            continue
+        write_bytes_atomic(path, data)
+    log("[SAVE] Artifacts: " + ", ".join(f"{names[kind]} ({len(data)} B)" for kind, data in files.items()))
+
+def artifact_hash(name):
+    """Хеш набору з назви артефакту: Vinnytsiaoblenerho.<hash>.min.json[.gz|.br] -> <hash>"""
+    return os.path.basename(name)[len(os.path.basename(ARTIFACT_PREFIX)):].split(".")[0]
+
+def prune_artifacts(*keep):
+    """Видалити набори артефактів, крім названих у keep (словники meta.artifacts)
+    
+    Зберігаються новий набір та набір попереднього файлу даних (клієнти, що ще завантажують
+    його, не отримають 404). Вибір - за назвами, не за mtime: git checkout у CI
+    ставить усім файлам однаковий час.
+    """
+    keep_hashes = {artifact_hash(name) for names in keep for name in names.values()}
+    sets = {}
+    for path in glob.glob(glob.escape(ARTIFACT_PREFIX) + "*.min.json*"):
+        sets.setdefault(artifact_hash(path), []).append(path)
+    
+    for old_hash in sorted(set(sets) - keep_hashes):
+        for path in sets[old_hash]:
+            os.unlink(path)
+        log("[SAVE] Removed old artifacts: " + old_hash)
+
+def save_queue_files(result, fact_masks, fact_timeline):
+    """Записати окремий файл для кожної черги (тільки для черг, розклад яких змінився)
+    
+    Хеш черги - slot_codec.schedules_hash її масок та хвилинної шкали за всі дні.
+    Повертає перелік перезаписаних GPV ключів
+    """
+    os.makedirs(QUEUE_DATA_DIR, exist_ok=True)
+    fact = result["fact"]
+    written = []
+    
+    for queue_key in ALL_QUEUE_KEYS:
+        gpv_key = QUEUE_TO_GPV[queue_key]
+        masks = {key: mask for key, mask in fact_masks.items() if key.endswith("/" + gpv_key)}
+        if not masks:
+            # Черги немає в даних (не відповіла і попередніх даних немає) - файл лишається як був
+            continue
+        timelines = {f"{day}/{gpv_key}": queues[gpv_key] for day, queues in fact_timeline.items() if gpv_key in queues}
+        queue_hash = slot_codec.schedules_hash(masks, timelines)
+        
+        path = os.path.join(QUEUE_DATA_DIR, gpv_key + ".json")
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                if json.load(f).get("meta", {}).get("contentHash") == queue_hash:
+                    continue
+        except (OSError, ValueError):
+            pass
+        
+        write_json_atomic(path, {
+            "regionId": result["regionId"],
+            "queue": gpv_key,
+            "name": result["preset"]["sch_names"].get(gpv_key, gpv_key),
+            "lastUpdated": result["lastUpdated"],
+            "fact": {
+                "data": {day: queues[gpv_key] for day, queues in fact["data"].items() if gpv_key in queues},
+                "timeline": {day: queues[gpv_key] for day, queues in fact["timeline"].items() if gpv_key in queues},
+                "update": fact["update"],
+                "today": fact["today"],
+            },
+            "meta": {
+                "schemaVersion": result["meta"]["schemaVersion"],
+                "contentHash": queue_hash,
+            },
+        }, indent=2)
+        written.append(gpv_key)
+    
+    log("[SAVE] Queue files updated: " + (", ".join(written) or "none"))
+    return written
+
+def append_delta(previous_data, result):
+    """Дописати в DELTA_FEED_FILE запис зі змінами розкладу (якщо вони є)
+    
+    Повертає номер останнього запису стрічки
+    """
+    dropped = delta_feed.truncate_partial_tail(DELTA_FEED_FILE)
+    if dropped:
+        LOGGER.warning(f"[SAVE] Dropped {dropped} bytes of an incomplete record at the end of {DELTA_FEED_FILE}")
+    seq = delta_feed.last_sequence(DELTA_FEED_FILE)
+    ops = delta_feed.diff_fact(previous_data.get("fact", {}), result["fact"])
+    if not ops:
+        return seq
+    
+    prev_fact = previous_data.get("fact", {})
+    for field in ("today", "update") if prev_fact else ():
+        if prev_fact.get(field) != result["fact"][field]:
+            ops.append({"op": "replace" if field in prev_fact else "add",
+                        "path": delta_feed.json_pointer("fact", field), "value": result["fact"][field]})
+    
+    seq += 1
+    delta_feed.append_record(DELTA_FEED_FILE, {
+        "seq": seq,
+        "at": result["lastUpdated"],
+        "baseHash": previous_data.get("meta", {}).get("contentHash"),
+        "contentHash": result["meta"]["contentHash"],
+        "ops": ops,
+    })
+    log(f"[SAVE] Delta #{seq}: {len(ops)} operations")
+    return seq
+
+def record_history(fact_masks, fact_timeline, observed_at, expect_existing=False):
+    """Додати змінені розклади в HISTORY_LOG та HISTORY_DB, оновити лічильники аналітики
+    (помилка не зупиняє збереження)
+    
+    База - у кеші і може зникнути: нові записи журналу переносяться в неї перед записом.
+    expect_existing - попередній файл даних був: якщо журналу при цьому немає, історія починається заново
+    """
+    if not HISTORY_DB:
+        return
+    try:
+        os.makedirs(os.path.dirname(HISTORY_DB) or ".", exist_ok=True)
+        if os.path.exists(LEGACY_HISTORY_DB) and os.path.abspath(LEGACY_HISTORY_DB) != os.path.abspath(HISTORY_DB):
+            shutil.move(LEGACY_HISTORY_DB, HISTORY_DB)
+            log(f"[HISTORY] Moved {LEGACY_HISTORY_DB} to {HISTORY_DB}")
+        with history_store.HistoryStore(HISTORY_DB) as store:
+            if not os.path.exists(HISTORY_LOG):
+                exported = store.export_log(HISTORY_LOG)
+                if exported:
+                    log(f"[HISTORY] Exported {exported} schedules from {HISTORY_DB} to {HISTORY_LOG}")
+                elif expect_existing:
+                    LOGGER.warning(f"[HISTORY] {HISTORY_LOG} not found although {DATA_FILE} exists - history starts over")
+            replayed = outage_analytics.sync_history(store, HISTORY_LOG)
+            if replayed:
+                log(f"[HISTORY] Restored {replayed} schedules from {HISTORY_LOG}")
+            added = store.ingest(fact_masks, fact_timeline, observed_at, log_path=HISTORY_LOG)
+            outage_analytics.update_counters(store.conn, added, observed_at)
+        log(f"[HISTORY] {len(added)} new schedules in {HISTORY_LOG}")
+    except Exception as e:
+        LOGGER.warning("[HISTORY] Write error: " + str(e))
+
+def same_update_status(previous_status, status):
+    """Чи той самий перелік застарілих та відсутніх черг (без урахування часу)"""
+    return (sorted(previous_status.get("stale", {})) == sorted(status["stale"])
+            and previous_status.get("missing", []) == status["missing"])
+
+def save_results(all_outages, stale=None, missing=None):
+    """Зберегти результати у JSON GPV формат
+    
+    Якщо contentHash та перелік застарілих/відсутніх черг не змінились,
+    файл даних не перезаписується - оновлюється тільки HEARTBEAT_FILE.
+    Повертає (чи записано файл даних, ключі "день/GPV", перераховані в цьому запуску)
+    """
     log("[SAVE] Transforming and writing GPV format")
     
     # Отримати поточний час у Kyiv timezone
@@ -383,11 +1176,16 @@ def save_results(all_outages):
     update_fact_str = kyiv_now.strftime('%d.%m.%Y %H:%M')
     
     # Трансформуємо дані
-    fact_data = transform_to_gpv(all_outages, kyiv_now)
+    with LOGGER.span("transform"):
+        fact_data, fact_masks, fact_timeline, dirty_keys = transform_to_gpv(all_outages, kyiv_now, missing or ())
+    previous_data = load_previous_data()
+    if missing:
+        fallback, missing = fill_missing_queues(fact_data, fact_masks, fact_timeline, previous_data, missing)
+        stale = {**(stale or {}), **fallback}
+    log_schedule_changes(fact_masks, previous_data)
     
     # Отримуємо сьогоднішню дату як Unix timestamp
-    today_date = kyiv_now.replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=KYIV_TZ)
-    today_ts = int(today_date.timestamp())
+    today_ts = day_start_ts(kyiv_now)
     
     # Створюємо структуру
     result = {
@@ -395,6 +1193,7 @@ def save_results(all_outages):
         "lastUpdated": last_updated_ts,
         "fact": {
             "data": fact_data,
+            "timeline": fact_timeline,
             "update": update_fact_str,
             "today": today_ts
         },
@@ -424,69 +1223,229 @@ def save_results(all_outages):
             },
             "updateFact": update_fact_str
         },
-        "lastUpdateStatus": {
-            "status": "parsed",
-            "ok": True,
-            "code": 200,
-            "message": None,
-            "at": last_updated_ts,
-            "attempt": 1
-        },
+        "lastUpdateStatus": build_update_status(last_updated_ts, stale, missing),
         "regionAffiliation": "Вінницька область"
     }
     
-    # Розраховуємо хеш контенту (факт даних)
-    fact_data_str = json.dumps(result['fact']['data'], sort_keys=True, ensure_ascii=False)
-    content_hash = calculate_hash(fact_data_str)
+    # Розраховуємо хеш контенту (компактні маски факт даних та хвилинна шкала)
+    content_hash = slot_codec.schedules_hash(fact_masks, slot_codec.encode_fact_timeline(fact_timeline))
     
     # Додаємо мета інформацію
     result["meta"] = {
-        "schemaVersion": "1.0.0",
-        "contentHash": content_hash
+        "schemaVersion": "1.1.0",
+        "contentHash": content_hash,
+        # Розклади "день/GPV", перераховані в цьому запуску (render_all.py --only-dirty)
+        "dirtySchedules": dirty_keys,
     }
     
     # Створити папку data якщо не існує
-    data_dir = "data"
-    if not os.path.exists(data_dir):
-        os.makedirs(data_dir)
-        log("[SAVE] Created directory: " + data_dir)
+    if not os.path.exists(DATA_DIR):
+        os.makedirs(DATA_DIR)
+        log("[SAVE] Created directory: " + DATA_DIR)
+    
+    # Файли черг перевіряються завжди: кожен пишеться тільки при зміні його хешу
+    save_queue_files(result, fact_masks, fact_timeline)
+    
+    # Розклад той самий - не перезаписуємо файл (і не створюємо коміт), тільки heartbeat
+    if (previous_data.get("meta", {}).get("contentHash") == content_hash
+            and same_update_status(previous_data.get("lastUpdateStatus", {}), result["lastUpdateStatus"])):
+        write_json_atomic(HEARTBEAT_FILE, {
+            "lastChecked": last_updated_ts,
+            "lastUpdated": previous_data.get("lastUpdated"),
+            "contentHash": content_hash,
+        }, indent=2)
+        log(f"[SAVE] Content hash unchanged ({content_hash}), touched {HEARTBEAT_FILE}")
+        return False, dirty_keys
     
-    # Записати файл у папку data
-    file_path = os.path.join(data_dir, "Vinnytsiaoblenerho.json")
-    with open(file_path, "w", encoding="utf-8") as f:
-        json.dump(result, f, ensure_ascii=False, indent=2)
+    # Зміни розкладу відносно попереднього файлу - у стрічку; номер останнього запису - у meta
+    result["meta"]["deltaSeq"] = append_delta(previous_data, result)
+    
+    # Незмінні копії цих даних поруч з файлом (можна кешувати назавжди): назва - хеш їхніх байтів
+    payload = artifact_payload(result)
+    names = artifact_names(payload)
+    result["meta"]["artifacts"] = names
+    
+    # Записати файл у папку data (атомарно); артефакти - першими, щоб посилання в meta були дійсні
+    file_path = DATA_FILE
+    with LOGGER.span("save", path=file_path):
+        write_artifacts(payload, names)
+        write_json_atomic(file_path, result, indent=2)
+        prune_artifacts(names, previous_data.get("meta", {}).get("artifacts", {}))
+    
+    # Черги без відповіді - не опублікований розклад, в історію не потрапляють
+    missing_gpv = {QUEUE_TO_GPV[k] for k in missing or []}
+    record_history({key: mask for key, mask in fact_masks.items() if key.split("/")[1] not in missing_gpv},
+                   fact_timeline, last_updated_ts, expect_existing=bool(previous_data))
     
     log("[SAVE] Success: Saved to " + file_path)
     log(f"[SAVE] Total dates: {len(fact_data)}, Queues per date: {len(ALL_QUEUE_KEYS)}, Content hash: {content_hash}")
+    return True, dirty_keys
 
-def main():
-    log("=" * 70)
-    log("E-SVITLO PARSER - START")
-    log("=" * 70)
-    
-    scraper = create_scraper()
-    login(scraper)
-    activate_session(scraper)
+def run_cycle(scraper, session_stats):
+    """Один цикл: завантажити черги та зберегти результат, якщо щось змінилось
     
+    Повертає 0 або EXIT_UNCHANGED
+    """
     log("[MAIN] Parsing 12 queues...")
     all_outages = []
     
-    for idx, (queue_key, url) in enumerate(zip(ALL_QUEUE_KEYS, QUEUE_URLS), 1):
-        queue_outages = parse_queue(scraper, url, queue_key, idx)
+    cache = load_queue_cache()
+    queue_cache = cache.get("queues", {})
+    changed_queues = []
+    stale = {}
+    missing = []
+    
+    results = fetch_all_queues(scraper, queue_cache)
+    for queue_key, (queue_outages, entry) in zip(ALL_QUEUE_KEYS, results):
+        prev = queue_cache.get(queue_key)
+        
+        if entry is None:
+            if prev is not None:
+                # Остання успішна відповідь замість порожнього графіку
+                log(f"[MAIN] {queue_key}: using last-known-good data from {prev.get('fetched_at')}")
+                queue_outages = prev['outages']
+                stale[queue_key] = prev.get('fetched_at')
+            else:
+                missing.append(queue_key)
+                changed_queues.append(queue_key)
+        else:
+            if prev is None or prev['fingerprint'] != entry['fingerprint']:
+                changed_queues.append(queue_key)
+            queue_cache[queue_key] = entry
+        
         all_outages.extend(queue_outages)
     
     log("[MAIN] Total outages: " + str(len(all_outages)))
-    save_results(all_outages)
+    log("[MAIN] Changed queues: " + (", ".join(changed_queues) or "none"))
+    if stale or missing:
+        log("[MAIN] Stale queues: " + (", ".join(stale) or "none") + "; missing: " + (", ".join(missing) or "none"))
+    
+    # Сервер міг оновити cookies під час запитів
+    save_session(scraper, session_stats)
+    
+    # Нічого не змінилось (включно з переліком застарілих черг) і день той самий -
+    # трансформація, збереження та рендеринг не потрібні
+    today_ts = day_start_ts(datetime.now(KYIV_TZ))
+    if (not changed_queues and cache.get("today") == today_ts
+            and sorted(stale) == cache.get("stale", []) and os.path.exists(DATA_FILE)):
+        log("[MAIN] No changes, skipping save (exit code " + str(EXIT_UNCHANGED) + ")")
+        return EXIT_UNCHANGED
     
+    written, dirty_keys = save_results(all_outages, stale=stale, missing=missing)
+    if written:
+        # Той самий перелік - у meta.dirtySchedules файлу даних (render_all.py --only-dirty)
+        log(f"[MAIN] Dirty schedules for rendering: {len(dirty_keys)}")
+    
+    # Кеш оновлюємо тільки після успішного збереження
+    save_queue_cache({"today": today_ts, "stale": sorted(stale), "queues": queue_cache})
+    return 0 if written else EXIT_UNCHANGED
+
+def next_poll_interval(kyiv_now, last_change_at, stable_cycles):
+    """Інтервал (сек) до наступного опитування в режимі демона
+    
+    Часто - ввечері (публікація графіку на завтра) та одразу після зміни,
+    рідше - коли дані довго стабільні. Не пропускає початок нової доби.
+    """
+    if POLL_EVENING_START <= kyiv_now.hour < POLL_EVENING_END:
+        interval = POLL_MIN
+    elif last_change_at is not None and time.time() - last_change_at < POLL_AFTER_CHANGE:
+        interval = POLL_MIN
+    else:
+        # Після 3 стабільних циклів подвоюємо інтервал до POLL_MAX
+        interval = min(POLL_MAX, POLL_BASE * 2 ** max(0, stable_cycles - 3))
+    
+    next_midnight = day_boundaries(kyiv_now.date(), 1)[1]
+    until_midnight = next_midnight - kyiv_now.timestamp() + 60
+    return min(interval, until_midnight)
+
+def render_outputs(only_dirty=False):
+    """Перегенерувати PNG з поточного файлу даних (рендерер імпортований один раз)
+    
+    only_dirty - окремі таблиці черг тільки для meta.dirtySchedules (див. render_all.render_all)
+    """
+    import render_all
+    
+    with LOGGER.span("render"):
+        render_all.render_all(DATA_FILE, IMAGES_DIR, only_dirty=only_dirty)
+
+def run_daemon():
+    """Довгоживучий режим: тепла сесія та рендерери, адаптивне опитування"""
     log("=" * 70)
-    log("DONE")
+    log("E-SVITLO PARSER - DAEMON")
     log("=" * 70)
+    
+    # Імпортуємо рендерери та бекенд (ESVITLO_RENDER_BACKEND) один раз на весь час роботи
+    started = time.monotonic()
+    import render_all  # noqa: F401
+    import render_layout
+    render_layout.backend_module()
+    log(f"[DAEMON] Renderers loaded in {time.monotonic() - started:.2f}s")
+    
+    scraper = create_scraper()
+    last_change_at = None
+    stable_cycles = 0
+    # Після старту або збою циклу (перераховані розклади могли не дійти до PNG) -
+    # повний рендеринг з перевіркою хешів; далі - тільки змінені розклади
+    render_pending = True
+    
+    while True:
+        try:
+            # Одна дешева перевірка сесії; повний логін тільки якщо вона протухла
+            session_stats = ensure_session(scraper)
+            
+            changed = run_cycle(scraper, session_stats) == 0
+            if changed or render_pending:
+                render_outputs(only_dirty=not render_pending)
+                render_pending = False
+            if changed:
+                last_change_at = time.time()
+                stable_cycles = 0
+            else:
+                stable_cycles += 1
+        except Exception as e:
+            render_pending = True
+            LOGGER.error("[DAEMON] Cycle error: " + str(e))
+        
+        interval = next_poll_interval(datetime.now(KYIV_TZ), last_change_at, stable_cycles)
+        log(f"[DAEMON] Next poll in {interval:.0f}s (stable cycles: {stable_cycles})")
+        LOGGER.flush()
+        time.sleep(interval)
+
+def main():
+    log("=" * 70)
+    log("E-SVITLO PARSER - START")
+    log("=" * 70)
+    
+    try:
+        with LOGGER.span("run"):
+            scraper = create_scraper()
+            session_stats = ensure_session(scraper)
+            
+            if run_cycle(scraper, session_stats) == EXIT_UNCHANGED:
+                return EXIT_UNCHANGED
+        
+        log("=" * 70)
+        log("DONE")
+        log("=" * 70)
+        return 0
+    finally:
+        LOGGER.flush()
 
 if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--daemon', action='store_true',
+                            help='працювати постійно з адаптивним інтервалом опитування та рендерингом PNG')
+    args = arg_parser.parse_args()
+    
     try:
-        main()
+        if args.daemon:
+            run_daemon()
+        else:
+            exit(main())
+    except KeyboardInterrupt:
+        log("[MAIN] Stopped")
     except Exception as e:
-        log("[MAIN] FATAL ERROR: " + str(e))
+        LOGGER.error("[MAIN] FATAL ERROR: " + str(e))
         import traceback
         traceback.print_exc()
         exit(1)
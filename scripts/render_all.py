@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+Schedule PNG Renderer - усі таблиці за один запуск
+Дані читаються один раз, бекенд рендерингу (render_layout.BACKENDS) імпортується один раз:
+- окремі таблиці черг (сьогодні + завтра): gpv-X-Y-emergency.png
+- таблиці усіх черг: gpv-all-today.png, gpv-all-tomorrow.png
+  та наступні дні горизонту: gpv-all-day-2.png (післязавтра), gpv-all-day-3.png, ...
+Генерує PNG тільки якщо дані змінилися (за хешем)
+Хеші зберігаються в папці hash/
+"""
+
+import json
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import logutil
+import render_layout as layout
+from slot_codec import encode_slots, schedules_hash
+
+LOGGER = logutil.get_logger()
+log = LOGGER.info
+
+# Години в окремих таблицях - у три рядки, в таблицях усіх черг - в один
+QUEUE_HOURS = tuple(f'{i:02d}\n-\n{i+1:02d}' for i in range(24))
+DAY_HOURS = tuple(f'{i:02d}-{i+1:02d}' for i in range(24))
+
+# Окрема таблиця черги: 2 рядки (сьогодні, завтра), дати та назва черги змінні
+QUEUE_LAYOUT = layout.TableLayout(
+    fig_height=3.5, corner_label='Дата', hours=QUEUE_HOURS, hour_fontsize=11, hour_linespacing=1.5,
+    header_h=1.0, num_rows=2, label_fontsize=12, row_labels=None, title=layout.TITLE)
+
+# Процесів для окремих таблиць черг (1 - у основному процесі)
+RENDER_JOBS = max(1, int(os.getenv("ESVITLO_RENDER_JOBS", "1")))
+
+# Назви таблиць усіх черг за номером доби від сьогодні
+DAY_VIEW_NAMES = {0: 'gpv-all-today', 1: 'gpv-all-tomorrow'}
+
+def load_data(json_path):
+    """Прочитати файл даних (один раз на запуск)"""
+    with open(json_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def format_gpv_filename(gpv_key):
+    """
+    Перетворює GPV2.1 -> gpv-2-1-emergency.png
+    """
+    cleaned = gpv_key.replace('GPV', '').replace('.', '-').lstrip('-')
+    return f"gpv-{cleaned}-emergency.png"
+
+def format_hash_filename(gpv_key):
+    """
+    Перетворює GPV2.1 -> gpv-2-1-emergency.hash
+    """
+    cleaned = gpv_key.replace('GPV', '').replace('.', '-').lstrip('-')
+    return f"gpv-{cleaned}-emergency.hash"
+
+def day_view_name(offset):
+    """Номер доби від сьогодні -> назва таблиці усіх черг (без розширення)"""
+    return DAY_VIEW_NAMES.get(offset, f'gpv-all-day-{offset}')
+
+def calculate_data_hash(today_data, tomorrow_data, gpv_key):
+    """Розраховує SHA256 хеш компактних масок черги (сьогодні + завтра)"""
+    return schedules_hash({
+        'today': encode_slots(today_data.get(gpv_key, {})),
+        'tomorrow': encode_slots(tomorrow_data.get(gpv_key, {})),
+    })
+
+def calculate_day_hash(day_data):
+    """Розраховує SHA256 хеш компактних масок усіх черг на добу"""
+    return schedules_hash({gpv_key: encode_slots(slots) for gpv_key, slots in day_data.items()})
+
+def hash_record(days, data_hash):
+    """Вміст .hash файлу: доби таблиці та хеш їх розкладів ("день/день/хеш")
+
+    Дати теж є на PNG: після півночі ті самі розклади на інших добах - інша таблиця.
+    """
+    return '/'.join([*days, data_hash])
+
+def record_days(record):
+    """Доби, для яких намальовано таблицю, з вмісту .hash файлу (None - старий формат або файлу немає)"""
+    if not record or '/' not in record:
+        return None
+    return record.split('/')[:-1]
+
+def schedule_days(fact_data, today_ts):
+    """Доби для таблиць: сьогодні, завтра та наступні дні з даних"""
+    days = [today_ts, layout.next_day_ts(fact_data, today_ts)]
+    days += sorted((k for k in fact_data if k.isdigit() and int(k) > int(days[1])), key=int)
+    return days
+
+def init_worker(backend):
+    """Ініціалізація процесу пулу: бекенд та статичний шар - один раз на процес
+
+    З fork процеси успадковують їх від основного процесу, з spawn / forkserver - створюють тут.
+    """
+    layout.get_template(QUEUE_LAYOUT, backend)
+
+def render_queue_job(job, backend=None):
+    """Намалювати одну таблицю черги (у процесі пулу або в основному процесі)"""
+    output_file, slots_rows, row_labels, texts, last_updated = job
+    try:
+        with LOGGER.span("render", file=output_file.name):
+            layout.get_template(QUEUE_LAYOUT, backend).render(
+                output_file, slots_rows, row_labels=row_labels, texts=texts, last_updated=last_updated)
+    finally:
+        # Процеси пулу завершуються без atexit - виводимо буфер журналу одразу
+        LOGGER.flush()
+
+def render_queue_images(data, out_p, hash_dir, gpv_key=None, backend=None, jobs=1, dirty=None):
+    """Окремі таблиці черг (сьогодні + завтра); backend - див. render_layout.BACKENDS
+
+    jobs > 1 - змінені таблиці малює пул процесів. Хеш таблиці записує
+    тільки основний процес і тільки після того, як її PNG успішно збережено.
+    dirty - ключі "день/GPV", перераховані парсером (meta.dirtySchedules): таблиці
+    черг, яких там немає, пропускаються без перевірки хешу, якщо PNG уже є і намальований
+    для тих самих діб (сьогодні, завтра).
+    """
+    fact_data = data.get('fact', {}).get('data', {})
+    sch_names = data.get('preset', {}).get('sch_names', {})
+    last_updated = data.get('fact', {}).get('update', '')
+    today_ts = str(data.get('fact', {}).get('today'))
+    tomorrow_ts = layout.next_day_ts(fact_data, today_ts)
+
+    today_data = fact_data.get(today_ts, {})
+    tomorrow_data = fact_data.get(tomorrow_ts, {})
+
+    today_str = layout.format_day(today_ts)
+    tomorrow_str = layout.format_day(tomorrow_ts)
+
+    gpv_keys = [gpv_key] if gpv_key else sorted([k for k in today_data if k.startswith('GPV')])
+
+    stats = {
+        'checked': 0,
+        'skipped': 0,
+        'generated': 0,
+        'failed': 0,
+    }
+    pending = []
+
+    for gkey in gpv_keys:
+        stats['checked'] += 1
+
+        # === ПЕРЕВІРЯЄМО ХЕШ ===
+        filename = format_gpv_filename(gkey)
+        output_file = out_p / filename
+        hash_filename = format_hash_filename(gkey)
+
+        prev_hash = layout.load_previous_hash(hash_dir, hash_filename)
+        if (dirty is not None and f'{today_ts}/{gkey}' not in dirty and f'{tomorrow_ts}/{gkey}' not in dirty
+                and record_days(prev_hash) == [today_ts, tomorrow_ts] and output_file.exists()):
+            log(f"[SKIP] {filename} (not in dirty schedules)")
+            stats['skipped'] += 1
+            continue
+
+        new_hash = hash_record([today_ts, tomorrow_ts], calculate_data_hash(today_data, tomorrow_data, gkey))
+
+        # Якщо хеші збігаються, пропускаємо генерацію
+        if new_hash == prev_hash and output_file.exists():
+            log(f"[SKIP] {filename} (no data changes)")
+            stats['skipped'] += 1
+            continue
+
+        # Етикетка черги
+        queue_label = (0.85, 0.97, sch_names.get(gkey, gkey), dict(
+            fontsize=18, fontweight='bold', ha='right',
+            bbox=dict(boxstyle='round,pad=0.5', facecolor='#FFD700', edgecolor='#000000', linewidth=1.5)))
+
+        job = (output_file,
+               [today_data.get(gkey, layout.empty_slots()), tomorrow_data.get(gkey, layout.empty_slots())],
+               [today_str, tomorrow_str], [queue_label], last_updated)
+        pending.append((job, hash_filename, new_hash))
+
+    def saved(job, hash_filename, new_hash):
+        stats['generated'] += 1
+        log(f"[OK] {job[0]}")
+        # Зберігаємо хеш в папку hash/
+        layout.save_hash(hash_dir, hash_filename, new_hash)
+
+    first_error = None
+    jobs = min(jobs, len(pending))
+    if jobs <= 1:
+        for job, hash_filename, new_hash in pending:
+            render_queue_job(job, backend)
+            saved(job, hash_filename, new_hash)
+    else:
+        # Бекенд та статичний шар - до старту процесів (з fork успадковуються); буфер журналу
+        # виводимо теж до старту, щоб процеси не успадкували (і не повторили) його рядки.
+        # Збій процесу (навіть аварійне завершення) не записує хеші незбережених PNG -
+        # наступний запуск перемалює їх
+        layout.get_template(QUEUE_LAYOUT, backend)
+        LOGGER.flush()
+        with LOGGER.span("render-pool", jobs=jobs, images=len(pending)):
+            with ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=(backend,)) as pool:
+                futures = {pool.submit(render_queue_job, job, backend): (job, hash_filename, new_hash)
+                           for job, hash_filename, new_hash in pending}
+                for future in as_completed(futures):
+                    job, hash_filename, new_hash = futures[future]
+                    try:
+                        future.result()
+                    except Exception as e:
+                        stats['failed'] += 1
+                        LOGGER.error(f"[ERROR] {job[0].name}: {type(e).__name__}: {e}")
+                        first_error = first_error or e
+                        continue
+                    saved(job, hash_filename, new_hash)
+
+    # Вивід статистики
+    log(f"\n[STATS] Checked: {stats['checked']}, Generated: {stats['generated']}, Skipped: {stats['skipped']}"
+        + (f", Failed: {stats['failed']}" if stats['failed'] else ""))
+    if first_error is not None:
+        raise first_error
+    return stats
+
+def render_day_image(data, out_p, hash_dir, offset, backend=None):
+    """Таблиця усіх черг на одну добу (offset - номер доби від сьогодні)"""
+    fact_data = data.get('fact', {}).get('data', {})
+    sch_names = data.get('preset', {}).get('sch_names', {})
+    last_updated = data.get('fact', {}).get('update', '')
+    today_ts = str(data.get('fact', {}).get('today'))
+
+    days = schedule_days(fact_data, today_ts)
+    if offset >= len(days):
+        return
+    day_ts = days[offset]
+    day_data = fact_data.get(day_ts, {})
+
+    name = day_view_name(offset)
+    output_file = out_p / f'{name}.png'
+    hash_filename = f'{name}.hash'
+
+    # === ПЕРЕВІРЯЄМО ХЕШ ===
+    new_hash = hash_record([day_ts], calculate_day_hash(day_data))
+    prev_hash = layout.load_previous_hash(hash_dir, hash_filename)
+
+    # Якщо хеші збігаються, пропускаємо генерацію
+    if new_hash == prev_hash and output_file.exists():
+        log(f"[SKIP] {name}.png (no data changes)")
+        return
+
+    log(f"[GENERATE] {name}.png")
+
+    # Усі GPV ключі доби (якщо немає - fallback на сьогодні)
+    gpv_keys = sorted([k for k in day_data if k.startswith('GPV')])
+    if not gpv_keys:
+        gpv_keys = sorted([k for k in fact_data.get(today_ts, {}) if k.startswith('GPV')])
+
+    if not gpv_keys:
+        LOGGER.error("ERROR: No GPV schedules found in data")
+        return
+
+    with LOGGER.span("render", file=f'{name}.png'):
+        # Висота фігури залежить від кількості графіків; назви черг - частина статичного шару
+        day_layout = layout.TableLayout(
+            fig_height=1.5 + (len(gpv_keys) * 0.5), corner_label='Черга', hours=DAY_HOURS,
+            hour_fontsize=10, hour_linespacing=None, header_h=1.2, num_rows=len(gpv_keys),
+            label_fontsize=10, row_labels=tuple(sch_names.get(k, k) for k in gpv_keys), title=None)
+
+        # Заголовок з датою
+        title = (0.15, 0.97, f'{layout.TITLE} на {layout.format_day(day_ts)}', dict(fontsize=18, fontweight='bold'))
+
+        layout.get_template(day_layout, backend).render(
+            output_file, [day_data.get(k, layout.empty_slots()) for k in gpv_keys],
+            texts=[title], last_updated=last_updated)
+        log(f"[OK] {output_file}")
+
+        # Зберігаємо хеш в папку hash/
+        layout.save_hash(hash_dir, hash_filename, new_hash)
+
+def render_all(json_path, out_path=None, backend=None, jobs=RENDER_JOBS, only_dirty=False):
+    """Усі таблиці з одного читання файлу даних
+
+    only_dirty - окремі таблиці черг тільки для розкладів з meta.dirtySchedules
+    та для таблиць, намальованих для інших діб (після півночі); якщо поля немає -
+    як зазвичай, за хешами. Таблиці усіх черг завжди перевіряються за хешем.
+    """
+    data = load_data(json_path)
+    out_p, hash_dir = layout.output_dirs(out_path)
+
+    dirty = data.get('meta', {}).get('dirtySchedules') if only_dirty else None
+    if dirty is not None:
+        dirty = set(dirty)
+        log(f"[RENDER] Dirty schedules: {len(dirty)}")
+    render_queue_images(data, out_p, hash_dir, backend=backend, jobs=jobs, dirty=dirty)
+
+    fact = data.get('fact', {})
+    days = schedule_days(fact.get('data', {}), str(fact.get('today')))
+    for offset in range(len(days)):
+        render_day_image(data, out_p, hash_dir, offset, backend)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--json', required=True)
+    parser.add_argument('--out', default=None)
+    parser.add_argument('--backend', choices=sorted(layout.BACKENDS), default=layout.DEFAULT_BACKEND)
+    parser.add_argument('--jobs', type=int, default=RENDER_JOBS, help='процесів для окремих таблиць черг')
+    parser.add_argument('--only-dirty', action='store_true',
+                        help='окремі таблиці черг тільки для meta.dirtySchedules файлу даних')
+    args = parser.parse_args()
+
+    with LOGGER.span("render", backend=args.backend):
+        render_all(args.json, args.out, args.backend, max(1, args.jobs), args.only_dirty)
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Спільний макет PNG-таблиць розкладів
+Кольори, розміри клітинок, легенда та підписи - однакові для окремих таблиць
+черг і таблиць усіх черг; малюють бекенди render_mpl.py (matplotlib)
+та render_raster.py (NumPy)
+Хеші зберігаються в папці hash/
+"""
+
+import importlib
+import os
+from collections import namedtuple
+from datetime import datetime, time as dt_time, timedelta
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+import logutil
+
+LOGGER = logutil.get_logger()
+
+ORANGE = '#FF8C00'
+WHITE = '#FFFFFF'
+GRAY_HEADER = '#E7E6E6'
+GRAY_LABEL = '#D9D9D9'
+BORDER = '#808080'
+
+SLOTS = list(range(1, 25))
+
+# Розміри клітинок (одиниці осей)
+CELL_W = 1.0
+CELL_H = 0.5
+LABEL_W = 2.0
+
+# Збереження як savefig(dpi=150, bbox_inches='tight', pad_inches=0.13)
+SAVE_DPI = 150
+PAD_INCHES = 0.13
+
+# Бекенд рендерингу: matplotlib (render_mpl.py) або numpy (render_raster.py)
+BACKENDS = {'matplotlib': 'render_mpl', 'numpy': 'render_raster'}
+DEFAULT_BACKEND = os.getenv("ESVITLO_RENDER_BACKEND", "matplotlib")
+
+# Кеш растрів статичного шару та атласу гліфів
+TEMPLATE_CACHE_DIR = os.path.join(os.getenv("ESVITLO_CACHE_DIR", ".cache"), "render")
+
+TITLE = 'Графік відключень для Вінницька область'
+
+# Легенда (частки рисунка): рядок, центр, крок між елементами
+LEGEND_Y = 0.005
+LEGEND_X_CENTER = 0.35
+LEGEND_SPACING = 0.09
+
+MONTHS_UK = {
+    1: 'січня', 2: 'лютого', 3: 'березня', 4: 'квітня',
+    5: 'травня', 6: 'червня', 7: 'липня', 8: 'серпня',
+    9: 'вересня', 10: 'жовтня', 11: 'листопада', 12: 'грудня'
+}
+
+# Таймзона Київ (UTC+2 взимку, UTC+3 влітку)
+KYIV_TZ = ZoneInfo("Europe/Kyiv")
+
+def next_day_ts(fact_data, day_ts):
+    """Наступна доба після day_ts (межі діб з урахуванням переходу на літній/зимовий час)"""
+    later = sorted(int(k) for k in fact_data if k.isdigit() and int(k) > int(day_ts))
+    if later:
+        return str(later[0])
+    next_date = datetime.fromtimestamp(int(day_ts), tz=KYIV_TZ).date() + timedelta(days=1)
+    return str(int(datetime.combine(next_date, dt_time(), tzinfo=KYIV_TZ).timestamp()))
+
+def format_day(day_ts):
+    """Unix timestamp доби -> "ДД місяць" (укр.), напр. "07 грудня" """
+    day_date = datetime.fromtimestamp(int(day_ts), tz=KYIV_TZ)
+    return f'{day_date.day:02d} {MONTHS_UK[day_date.month]}'
+
+def empty_slots():
+    """Слоти без відключень (черги немає в даних)"""
+    return {str(i): 'yes' for i in range(1, 25)}
+
+def output_dirs(out_path):
+    """Папка для PNG та папка hash/ всередині неї"""
+    if out_path:
+        out_p = Path(out_path)
+        out_p.mkdir(parents=True, exist_ok=True)
+    else:
+        out_p = Path('.')
+    return out_p, out_p / 'hash'
+
+def load_previous_hash(hash_dir, hash_filename):
+    """Завантажує попередній хеш з папки hash/"""
+    hash_file = hash_dir / hash_filename
+
+    if hash_file.exists():
+        try:
+            with open(hash_file, 'r', encoding='utf-8') as f:
+                return f.read().strip()
+        except Exception as e:
+            LOGGER.warning(f"[WARN] Could not read hash file {hash_file}: {e}")
+    return None
+
+def save_hash(hash_dir, hash_filename, data_hash):
+    """Зберігає хеш даних у папку hash/"""
+    hash_dir.mkdir(parents=True, exist_ok=True)
+
+    hash_file = hash_dir / hash_filename
+
+    try:
+        with open(hash_file, 'w', encoding='utf-8') as f:
+            f.write(data_hash)
+    except Exception as e:
+        LOGGER.warning(f"[WARN] Could not save hash file {hash_file}: {e}")
+
+# Коди станів слота (як у slot_engine) та заливка клітинки: (зсув, ширина) у частках CELL_W
+STATE_CODES = {'yes': 0, 'second': 1, 'first': 2, 'no': 3}
+FILL_SPANS = np.array([(0.0, 0.0), (0.5, 0.5), (0.0, 0.5), (0.0, 1.0)])
+
+def slot_codes(slots):
+    """Слоти GPV {"1": "yes", ...} -> коди станів [24]"""
+    return np.array([STATE_CODES.get(slots.get(str(slot_num), 'yes'), 0) for slot_num in SLOTS], dtype=np.int64)
+
+class TableLayout(namedtuple('TableLayout', (
+        'fig_height', 'corner_label', 'hours', 'hour_fontsize', 'hour_linespacing',
+        'header_h', 'num_rows', 'label_fontsize', 'row_labels', 'title'))):
+    """Параметри макета таблиці - усе, від чого залежить статичний шар
+
+    row_labels - постійні підписи рядків (кортеж) або None, якщо підписи
+    змінюються від PNG до PNG; title - постійний заголовок або None.
+    """
+
+_templates = {}
+
+def backend_module(backend=None):
+    """Модуль бекенду рендерингу (імпортується при першому зверненні)"""
+    backend = backend or DEFAULT_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown render backend: {backend} (expected one of {', '.join(BACKENDS)})")
+    return importlib.import_module(BACKENDS[backend])
+
+def get_template(layout, backend=None):
+    """Статичний шар для макета (один на процес і бекенд)"""
+    backend = backend or DEFAULT_BACKEND
+    template = _templates.get((backend, layout))
+    if template is None:
+        template = _templates[(backend, layout)] = backend_module(backend).TableTemplate(layout)
+    return template
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+Бекенд рендерингу matplotlib
+Клітинки таблиці - одна PolyCollection, статичний шар растеризується
+один раз на макет і кешується (TableTemplate)
+"""
+
+import hashlib
+import os
+import sys
+import tempfile
+
+import logutil
+from render_layout import (
+    BORDER, CELL_H, CELL_W, FILL_SPANS, GRAY_HEADER, GRAY_LABEL, LABEL_W, LEGEND_SPACING, LEGEND_X_CENTER,
+    LEGEND_Y, ORANGE, PAD_INCHES, SAVE_DPI, TEMPLATE_CACHE_DIR, WHITE, slot_codes,
+)
+
+LOGGER = logutil.get_logger()
+
+try:
+    import matplotlib
+    import matplotlib.image as mpl_image
+    import matplotlib.pyplot as plt
+    from matplotlib.collections import PolyCollection
+    from matplotlib.colors import to_rgba_array
+    from matplotlib.patches import Rectangle
+    from matplotlib.transforms import Bbox
+    import numpy as np
+    try:
+        from matplotlib._tight_bbox import adjust_bbox
+    except ImportError:  # matplotlib < 3.6
+        from matplotlib.tight_bbox import adjust_bbox
+except ImportError:
+    LOGGER.error("ERROR: pip install matplotlib")
+    sys.exit(1)
+
+# Версія статичного шару в кеші; збільшувати при зміні макета
+TEMPLATE_VERSION = 1
+
+def new_figure(fig_height):
+    """Біла фігура 20 x fig_height дюймів з однією віссю"""
+    fig, ax = plt.subplots(figsize=(20, fig_height), dpi=100)
+    fig.patch.set_facecolor(WHITE)
+    ax.set_facecolor(WHITE)
+    return fig, ax
+
+def quads(x, y, w, h):
+    """Прямокутники [N] -> вершини [N, 4, 2] (обхід як у Rectangle)"""
+    x, y, w, h = np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in (x, y, w, h)))
+    return np.stack([
+        np.stack([x, y], -1), np.stack([x + w, y], -1),
+        np.stack([x + w, y + h], -1), np.stack([x, y + h], -1),
+    ], axis=-2)
+
+def frame_cells(header_h, num_rows):
+    """Клітинки рамки таблиці: рядок годин (кут + 24 години) та колонка підписів рядків
+
+    Повертає (вершини [N, 4, 2], кольори заливки [N, 4], кольори ліній [N, 4], товщини [N]).
+    """
+    border, gray_header, gray_label = to_rgba_array([BORDER, GRAY_HEADER, GRAY_LABEL])
+
+    header_x = np.concatenate([[0.0], LABEL_W + np.arange(24) * CELL_W])
+    header_w = np.concatenate([[LABEL_W], np.full(24, CELL_W)])
+    row_y = header_h + np.arange(num_rows) * CELL_H
+
+    verts = np.concatenate([quads(header_x, 0.0, header_w, header_h), quads(0.0, row_y, LABEL_W, CELL_H)])
+    faces = np.concatenate([np.tile(gray_header, (25, 1)), np.tile(gray_label, (num_rows, 1))])
+    return verts, faces, np.tile(border, (len(verts), 1)), np.ones(len(verts))
+
+def slot_cells(header_h, codes):
+    """Клітинки слотів одним масивом у порядку малювання
+
+    codes - коди станів [рядки, 24]. Для кожного слота - три прямокутники:
+    білий фон з бордюром, оранжева заливка (порожня для "yes") та бордюр
+    поверх, як окремі Rectangle раніше - порядок шарів не змінюється.
+    Повертає (вершини [N, 4, 2], кольори заливки [N, 4], кольори ліній [N, 4], товщини [N]).
+    """
+    num_rows = len(codes)
+    white, orange, border, none = to_rgba_array([WHITE, ORANGE, BORDER, 'none'])
+
+    # [рядки, 24 * 3]: (фон, заливка, бордюр) кожного слота
+    row_y = header_h + np.arange(num_rows) * CELL_H
+    slot_x = LABEL_W + np.arange(24) * CELL_W
+    fill = FILL_SPANS[codes] * CELL_W
+    per_slot = 3
+
+    x = np.empty((num_rows, 24 * per_slot))
+    w = np.empty_like(x)
+    x[:, 0::per_slot], w[:, 0::per_slot] = slot_x, CELL_W
+    x[:, 1::per_slot], w[:, 1::per_slot] = slot_x + fill[..., 0], fill[..., 1]
+    x[:, 2::per_slot], w[:, 2::per_slot] = slot_x, CELL_W
+
+    face = np.empty(x.shape + (4,))
+    face[:, 0::per_slot] = white
+    face[:, 1::per_slot] = np.where((codes != 0)[..., None], orange, none)
+    face[:, 2::per_slot] = none
+
+    edge = np.empty_like(face)
+    edge[:] = border
+    edge[:, 1::per_slot] = none
+
+    width = np.ones(x.shape)
+    width[:, 1::per_slot] = 0
+
+    return (quads(x, row_y[:, None], w, CELL_H).reshape(-1, 4, 2), face.reshape(-1, 4),
+            edge.reshape(-1, 4), width.reshape(-1))
+
+def cell_collection(cells):
+    """(вершини, заливки, лінії, товщини) -> PolyCollection (кути ліній як у Rectangle)"""
+    verts, faces, edges, widths = cells
+    return PolyCollection(verts, facecolors=faces, edgecolors=edges, linewidths=widths, joinstyle='miter')
+
+def draw_legend(fig, table_width, table_height):
+    """Легенда з клітинками аналогічно таблиці (4 стани слота)"""
+    legend_y = LEGEND_Y  # Низько
+    legend_x_center = LEGEND_X_CENTER  # Лівіше від центру, але в межах таблиці
+
+    # Розміри клітинок в легенді (пропорційні до таблиці)
+    table_fig_width = 0.9 - 0.05  # 0.85
+    cell_w_fig = table_fig_width / table_width  # пропорція cell_w
+    cell_h_fig = (0.85 - 0.15) / table_height * CELL_H  # пропорція cell_h (без заголовка)
+
+    # Проміжок між елементами легенди
+    spacing = LEGEND_SPACING
+
+    def cell(x, width, facecolor, linewidth=0, edgecolor=None):
+        rect = Rectangle((x, legend_y - cell_h_fig/2), width, cell_h_fig,
+                         linewidth=linewidth, edgecolor=edgecolor, facecolor=facecolor,
+                         transform=fig.transFigure, clip_on=False)
+        fig.patches.append(rect)
+
+    # Елемент 1: Пуста біла клітинка - "Світло є"
+    x1 = legend_x_center - 1.8 * spacing
+    cell(x1 - cell_w_fig/2, cell_w_fig, WHITE, 0.5, BORDER)
+    fig.text(x1 + cell_w_fig/2 + 0.005, legend_y, 'Світло є', fontsize=11, va='center')
+
+    # Елемент 2: Повністю оранжева клітинка - "Світла нема"
+    x2 = legend_x_center - 0.6 * spacing
+    cell(x2 - cell_w_fig/2, cell_w_fig, ORANGE, 0.5, BORDER)
+    fig.text(x2 + cell_w_fig/2 + 0.005, legend_y, 'Світла нема', fontsize=11, va='center')
+
+    # Елемент 3: Ліва половина біла, права оранжева - "Світла нема перші 30 хв."
+    x3 = legend_x_center + 0.6 * spacing
+    cell(x3 - cell_w_fig/2, cell_w_fig/2, WHITE)
+    cell(x3, cell_w_fig/2, ORANGE)
+    cell(x3 - cell_w_fig/2, cell_w_fig, 'none', 0.5, BORDER)
+    fig.text(x3 + cell_w_fig/2 + 0.005, legend_y, 'Світла нема\nперші 30 хв.', fontsize=11, va='center')
+
+    # Елемент 4: Ліва половина оранжева, права біла - "Світла нема другі 30 хв."
+    x4 = legend_x_center + 1.8 * spacing
+    cell(x4 - cell_w_fig/2, cell_w_fig/2, ORANGE)
+    cell(x4, cell_w_fig/2, WHITE)
+    cell(x4 - cell_w_fig/2, cell_w_fig, 'none', 0.5, BORDER)
+    fig.text(x4 + cell_w_fig/2 + 0.005, legend_y, 'Світла нема\nдругі 30 хв.', fontsize=11, va='center')
+
+class TableTemplate:
+    """Статичний шар таблиці одного макета, намальований один раз
+
+    Рамка з годинами, колонка підписів, легенда та постійні тексти
+    растеризуються один раз; для кожного PNG поверх растру малюються тільки
+    слоти, змінні підписи та дата оновлення. Результат - як у
+    savefig(dpi=150, bbox_inches='tight', pad_inches=0.13). Растр
+    перемальовується, якщо змінні тексти змінили межі рисунка.
+    """
+
+    def __init__(self, layout):
+        self.layout = layout
+        self.background = None
+        self.bounds = None
+        self.static_extent = None
+
+        fig, ax = new_figure(layout.fig_height)
+        fig.set_dpi(SAVE_DPI)
+        self.fig, self.ax = fig, ax
+
+        table_width = LABEL_W + 24 * CELL_W
+        table_height = layout.header_h + layout.num_rows * CELL_H
+
+        ax.add_collection(cell_collection(frame_cells(layout.header_h, layout.num_rows)), autolim=False)
+
+        # === Підписи: "Дата" / "Черга", години, постійні підписи рядків ===
+        ax.text(LABEL_W/2, layout.header_h/2, layout.corner_label, fontsize=12, ha='center', va='center',
+               fontweight='bold', color='#000000')
+        for i in range(24):
+            ax.text(LABEL_W + i * CELL_W + CELL_W/2, layout.header_h/2, layout.hours[i],
+                   fontsize=layout.hour_fontsize, ha='center', va='center', fontweight='bold',
+                   color='#000000', linespacing=layout.hour_linespacing)
+        for row, label in enumerate(layout.row_labels or ()):
+            self._row_label(row, label)
+
+        ax.set_xlim(0, table_width)
+        ax.set_ylim(0, table_height)
+        ax.invert_yaxis()
+
+        ax.set_xticks([])
+        ax.set_yticks([])
+        ax.margins(0)
+        for spine in ax.spines.values():
+            spine.set_visible(False)
+
+        if layout.title:
+            fig.text(0.15, 0.97, layout.title, fontsize=18, fontweight='bold')
+        draw_legend(fig, table_width, table_height)
+
+    def _row_label(self, row, label):
+        return self.ax.text(LABEL_W/2, self.layout.header_h + row * CELL_H + CELL_H/2, label,
+                            fontsize=self.layout.label_fontsize, ha='center', va='center',
+                            fontweight='bold', color='#000000')
+
+    def cache_path(self):
+        """Файл растру в TEMPLATE_CACHE_DIR: ключ - макет, TEMPLATE_VERSION та версія matplotlib"""
+        key = hashlib.sha256(repr((self.layout, TEMPLATE_VERSION, matplotlib.__version__)).encode('utf-8'))
+        return os.path.join(TEMPLATE_CACHE_DIR, f'{key.hexdigest()[:16]}.npz')
+
+    def _load_background(self, bounds):
+        try:
+            with np.load(self.cache_path()) as cached:
+                if tuple(cached['bounds'].tolist()) == bounds:
+                    return cached['pixels']
+        except (OSError, KeyError, ValueError):
+            pass
+        return None
+
+    def _save_background(self, bounds):
+        try:
+            os.makedirs(TEMPLATE_CACHE_DIR, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=TEMPLATE_CACHE_DIR, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                np.savez_compressed(f, pixels=self.background, bounds=np.array(bounds))
+            os.replace(tmp_path, self.cache_path())
+        except OSError as e:
+            LOGGER.warning(f"[WARN] Could not save template cache: {e}")
+
+    def _prepare_background(self, bbox, dynamic):
+        """Растр статичного шару в межах bbox (з кешу або намальований заново)"""
+        bounds = tuple(float(v) for v in bbox.bounds)
+        if bounds == self.bounds:
+            return
+        self.background = self._load_background(bounds)
+        if self.background is None:
+            for artist in dynamic:
+                artist.set_visible(False)
+            restore = adjust_bbox(self.fig, bbox, self.fig.dpi)
+            try:
+                self.fig.canvas.draw()
+                self.background = np.array(self.fig.canvas.buffer_rgba())
+            finally:
+                restore()
+                for artist in dynamic:
+                    artist.set_visible(True)
+            self._save_background(bounds)
+        self.bounds = bounds
+
+    def render(self, output_file, slots_rows, row_labels=None, texts=(), last_updated=''):
+        """Намалювати PNG: статичний шар + слоти, змінні підписи та тексти
+
+        slots_rows - слоти GPV для кожного рядка, row_labels - підписи рядків
+        (якщо макет без постійних), texts - [(x, y, текст, параметри fig.text), ...].
+        """
+        fig, ax = self.fig, self.ax
+        codes = np.array([slot_codes(slots) for slots in slots_rows], dtype=np.int64).reshape(-1, 24)
+
+        dynamic = [ax.add_collection(cell_collection(slot_cells(self.layout.header_h, codes)), autolim=False)]
+        dynamic += [self._row_label(row, label) for row, label in enumerate(row_labels or ())]
+        dynamic += [fig.text(x, y, text, **kwargs) for x, y, text, kwargs in texts]
+        if last_updated:
+            dynamic.append(fig.text(0.8, 0.001, f'Опубліковано {last_updated}', fontsize=11, ha='right',
+                                    style='italic'))
+
+        try:
+            # Межі як у savefig(bbox_inches='tight'): межі статичного шару + змінних елементів
+            renderer = fig.canvas.get_renderer()
+            if self.static_extent is None:
+                for artist in dynamic:
+                    artist.set_visible(False)
+                self.static_extent = fig.get_tightbbox(renderer)
+                for artist in dynamic:
+                    artist.set_visible(True)
+            to_inches = fig.dpi_scale_trans.inverted()
+            extents = [self.static_extent] + [artist.get_tightbbox(renderer).transformed(to_inches)
+                                              for artist in dynamic]
+            bbox = Bbox.union(extents).padded(PAD_INCHES)
+            self._prepare_background(bbox, dynamic)
+
+            restore = adjust_bbox(fig, bbox, fig.dpi)
+            try:
+                renderer = fig.canvas.get_renderer()
+                np.asarray(renderer.buffer_rgba())[...] = self.background
+                for artist in dynamic:
+                    artist.draw(renderer)
+                mpl_image.imsave(output_file, renderer.buffer_rgba(), format='png', origin='upper', dpi=fig.dpi)
+            finally:
+                restore()
+        finally:
+            for artist in dynamic:
+                artist.remove()
@@ -0,0 +1,447 @@
+#!/usr/bin/env python3
+"""
+Бекенд рендерингу NumPy (без matplotlib під час рендерингу)
+Таблиця малюється прямо в масив індексів палітри, текст - з атласу гліфів,
+PNG кодується zlib як індексоване зображення (8 біт, PLTE)
+Атлас растеризується один раз через matplotlib (FT2Font, ті самі шрифти)
+і кешується в ESVITLO_CACHE_DIR/render/; далі matplotlib не імпортується
+Геометрія та кольори - як у render_mpl.py (savefig з bbox_inches='tight')
+"""
+
+import hashlib
+import os
+import struct
+import tempfile
+import zlib
+
+import numpy as np
+
+import logutil
+from render_layout import (
+    BORDER, CELL_H, CELL_W, GRAY_HEADER, GRAY_LABEL, LABEL_W, LEGEND_SPACING, LEGEND_X_CENTER, LEGEND_Y,
+    ORANGE, PAD_INCHES, SAVE_DPI, TEMPLATE_CACHE_DIR, WHITE, slot_codes,
+)
+
+LOGGER = logutil.get_logger()
+
+# Версія атласу в кеші; збільшувати при зміні набору символів або растеризації
+ATLAS_VERSION = 1
+
+# Стилі тексту таблиць: (розмір у пунктах, жирний, курсив)
+TEXT_STYLES = ((10, True, False), (11, True, False), (12, True, False), (18, True, False),
+               (11, False, False), (11, False, True))
+
+# Символи атласу: ASCII, українська / російська кирилиця, типографські знаки
+CHARSET = (''.join(chr(c) for c in range(32, 127)) + ''.join(chr(c) for c in range(0x410, 0x450))
+           + 'ЁёЄєІіЇїҐґ’ʼ«»–—№')
+
+# Геометрія рисунка як у matplotlib: 20 дюймів завширшки, осі - figure.subplot.* за замовчуванням
+FIG_WIDTH_IN = 20
+AXES_LEFT, AXES_RIGHT, AXES_BOTTOM, AXES_TOP = 0.125, 0.9, 0.11, 0.88
+
+# Запас полотна навколо рисунка: заголовок і легенда виходять за його межі, як у matplotlib
+MARGIN = 80
+
+GOLD = '#FFD700'
+BLACK = '#000000'
+
+# Палітра: базовий колір * 16 + рівень тексту (0 - чистий колір, 15 - чорний)
+BASE_COLORS = (WHITE, ORANGE, BORDER, GRAY_HEADER, GRAY_LABEL, GOLD, BLACK)
+TEXT_LEVELS = 16
+WHITE_IDX, ORANGE_IDX, BORDER_IDX, HEADER_IDX, LABEL_IDX, GOLD_IDX, BLACK_IDX = (
+    i * TEXT_LEVELS for i in range(len(BASE_COLORS)))
+
+def hex_rgb(color):
+    return tuple(int(color[i:i + 2], 16) for i in (1, 3, 5))
+
+def build_palette():
+    """Палітра PLTE [базові кольори * 16, 3]: кожен колір, змішаний з чорним текстом у 16 рівнях"""
+    base = np.array([hex_rgb(color) for color in BASE_COLORS], dtype=np.float64)
+    keep = (TEXT_LEVELS - 1 - np.arange(TEXT_LEVELS)) / (TEXT_LEVELS - 1)
+    return np.rint(base[:, None, :] * keep[None, :, None]).astype(np.uint8).reshape(-1, 3)
+
+PALETTE = build_palette()
+
+def points_to_px(points):
+    return points * SAVE_DPI / 72.0
+
+def encode_png(indices, palette=PALETTE, level=6):
+    """Масив індексів [H, W] uint8 -> байти PNG (індексований колір, 8 біт, фільтр None)"""
+    height, width = indices.shape
+    raw = np.zeros((height, width + 1), dtype=np.uint8)
+    raw[:, 1:] = indices
+
+    def chunk(tag, data):
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    ppm = int(round(SAVE_DPI / 0.0254))
+    return b''.join([
+        b'\x89PNG\r\n\x1a\n',
+        chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 3, 0, 0, 0)),
+        chunk(b'PLTE', palette.tobytes()),
+        chunk(b'pHYs', struct.pack('>IIB', ppm, ppm, 1)),
+        chunk(b'IDAT', zlib.compress(raw.tobytes(), level)),
+        chunk(b'IEND', b''),
+    ])
+
+class FontAtlas:
+    """Гліфи одного стилю: {символ: (рівні покриття [h, w], зсув x, зсув y від базової лінії, крок)}
+
+    ascent / descent - метрики рядка "lp", як у розкладці тексту matplotlib.
+    """
+
+    def __init__(self, glyphs, ascent, descent):
+        self.glyphs = glyphs
+        self.ascent = ascent
+        self.descent = descent
+
+    def advance(self, text):
+        space = self.glyphs.get(' ')
+        return sum(self.glyphs.get(ch, space)[3] for ch in text)
+
+def atlas_path():
+    key = hashlib.sha256(repr((ATLAS_VERSION, TEXT_STYLES, CHARSET, SAVE_DPI)).encode('utf-8'))
+    return os.path.join(TEMPLATE_CACHE_DIR, f'atlas-{key.hexdigest()[:16]}.npz')
+
+def rasterize_atlas():
+    """Растеризувати гліфи всіх стилів через FT2Font matplotlib -> масиви для np.savez"""
+    from matplotlib import font_manager, ft2font
+    from matplotlib.backends.backend_agg import get_hinting_flag
+
+    arrays = {}
+    flags = get_hinting_flag()
+    for style_idx, (size, bold, italic) in enumerate(TEXT_STYLES):
+        prop = font_manager.FontProperties(size=size, weight='bold' if bold else 'normal',
+                                           style='italic' if italic else 'normal')
+        font = ft2font.FT2Font(font_manager.findfont(prop))
+        font.set_size(size, SAVE_DPI)
+
+        font.set_text('lp', 0.0, flags=flags)
+        lp_height = font.get_width_height()[1] / 64
+        lp_descent = font.get_descent() / 64
+
+        codes, boxes, blobs = [], [], []
+        offset = 0
+        for ch in CHARSET:
+            if not font.get_char_index(ord(ch)):
+                continue
+            advance = font.load_char(ord(ch), flags=flags).horiAdvance / 64
+            font.set_text(ch, 0.0, flags=flags)
+            font.draw_glyphs_to_bitmap(antialiased=True)
+            image = np.asarray(font.get_image())
+            left = font.get_bitmap_offset()[0] / 64
+            top = image.shape[0] - font.get_descent() / 64
+            levels = ((image.astype(np.uint16) * (TEXT_LEVELS - 1) + 127) // 255).astype(np.uint8)
+
+            codes.append(ord(ch))
+            boxes.append((offset, image.shape[0], image.shape[1], left, top, advance))
+            blobs.append(levels.reshape(-1))
+            offset += levels.size
+
+        arrays[f'codes{style_idx}'] = np.array(codes, dtype=np.int32)
+        arrays[f'boxes{style_idx}'] = np.array(boxes, dtype=np.float64)
+        arrays[f'blob{style_idx}'] = np.concatenate(blobs) if blobs else np.zeros(0, dtype=np.uint8)
+        arrays[f'metrics{style_idx}'] = np.array([lp_height - lp_descent, lp_descent])
+    return arrays
+
+def unpack_atlas(arrays):
+    atlas = {}
+    for style_idx, style in enumerate(TEXT_STYLES):
+        blob = arrays[f'blob{style_idx}']
+        glyphs = {}
+        for code, (offset, height, width, left, top, advance) in zip(
+                arrays[f'codes{style_idx}'].tolist(), arrays[f'boxes{style_idx}'].tolist()):
+            offset, height, width = int(offset), int(height), int(width)
+            glyphs[chr(code)] = (blob[offset:offset + height * width].reshape(height, width), left, top, advance)
+        ascent, descent = arrays[f'metrics{style_idx}'].tolist()
+        atlas[style] = FontAtlas(glyphs, ascent, descent)
+    return atlas
+
+_atlas = None
+
+def get_atlas():
+    """Атлас гліфів: з кешу, або растеризувати (matplotlib) та зберегти"""
+    global _atlas
+    if _atlas is not None:
+        return _atlas
+
+    path = atlas_path()
+    try:
+        with np.load(path) as cached:
+            _atlas = unpack_atlas({name: cached[name] for name in cached.files})
+            return _atlas
+    except (OSError, KeyError, ValueError):
+        pass
+
+    arrays = rasterize_atlas()
+    try:
+        os.makedirs(TEMPLATE_CACHE_DIR, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=TEMPLATE_CACHE_DIR, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        LOGGER.warning(f"[WARN] Could not save glyph atlas: {e}")
+    _atlas = unpack_atlas(arrays)
+    return _atlas
+
+class Canvas:
+    """Полотно з індексів палітри; координати - пікселі від лівого верхнього кута полотна
+
+    extents - межі всього намальованого (для обрізки як bbox_inches='tight').
+    """
+
+    def __init__(self, width, height, pixels=None, extents=None):
+        self.width = width
+        self.height = height
+        self.pixels = pixels if pixels is not None else np.full(
+            (height + 2 * MARGIN, width + 2 * MARGIN), WHITE_IDX, dtype=np.uint8)
+        self.extents = extents if extents is not None else []
+
+    def copy(self):
+        return Canvas(self.width, self.height, self.pixels.copy(), list(self.extents))
+
+    def fig_point(self, fx, fy):
+        """Частки рисунка (matplotlib: від лівого нижнього кута) -> пікселі полотна"""
+        return MARGIN + fx * self.width, MARGIN + (1 - fy) * self.height
+
+    def fill(self, x0, y0, x1, y1, color):
+        self.pixels[int(round(y0)):int(round(y1)), int(round(x0)):int(round(x1))] = color
+        self.extents.append((x0, y0, x1, y1))
+
+    def stroke(self, x0, y0, x1, y1, color, linewidth_pt):
+        """Контур прямокутника лінією linewidth_pt пунктів (по центру країв)"""
+        lw = max(1, int(round(points_to_px(linewidth_pt))))
+        half = lw / 2
+        left, right = int(round(x0 - half)), int(round(x1 - half))
+        top, bottom = int(round(y0 - half)), int(round(y1 - half))
+        self.pixels[top:top + lw, left:right + lw] = color
+        self.pixels[bottom:bottom + lw, left:right + lw] = color
+        self.pixels[top:bottom + lw, left:left + lw] = color
+        self.pixels[top:bottom + lw, right:right + lw] = color
+        self.extents.append((x0 - half, y0 - half, x1 + half, y1 + half))
+
+    def blend(self, x, y, levels):
+        """Накласти чорний гліф (рівні покриття 0..15) з лівим верхнім кутом у (x, y)"""
+        h, w = levels.shape
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + w, self.pixels.shape[1]), min(y + h, self.pixels.shape[0])
+        if x0 >= x1 or y0 >= y1:
+            return
+        region = self.pixels[y0:y1, x0:x1]
+        coverage = levels[y0 - y:y1 - y, x0 - x:x1 - x].astype(np.int16)
+        top = TEXT_LEVELS - 1
+        current = (region % TEXT_LEVELS).astype(np.int16)
+        mixed = top - ((top - current) * (top - coverage) + top // 2) // top
+        region[...] = (region - region % TEXT_LEVELS) + mixed.astype(np.uint8)
+
+    def text(self, atlas, x, y, text, ha='left', va='baseline', linespacing=1.2):
+        """Текст як у matplotlib: (x, y) - точка прив'язки за ha / va; повертає межі тексту"""
+        lines = text.split('\n')
+        widths = [atlas.advance(line) for line in lines]
+        line_step = atlas.descent + atlas.ascent * linespacing
+        height = atlas.ascent + line_step * (len(lines) - 1) + atlas.descent
+
+        if va == 'center':
+            first_baseline = y - height / 2 + atlas.ascent
+        elif va == 'top':
+            first_baseline = y + atlas.ascent
+        elif va == 'bottom':
+            first_baseline = y - height + atlas.ascent
+        else:
+            first_baseline = y
+
+        box_width = max(widths)
+        box_left = {'center': x - box_width / 2, 'right': x - box_width}.get(ha, x)
+        for i, (line, width) in enumerate(zip(lines, widths)):
+            pen = {'center': x - width / 2, 'right': x - width}.get(ha, x)
+            baseline = first_baseline + i * line_step
+            for ch in line:
+                glyph = atlas.glyphs.get(ch) or atlas.glyphs[' ']
+                levels, left, top, advance = glyph
+                if levels.size:
+                    self.blend(int(round(pen + left)), int(round(baseline - top)), levels)
+                pen += advance
+
+        box = (box_left, first_baseline - atlas.ascent, box_left + box_width,
+               first_baseline - atlas.ascent + height)
+        self.extents.append(box)
+        return box
+
+    def rounded_box(self, x0, y0, x1, y1, radius, facecolor, edgecolor, linewidth_pt):
+        """Заокруглений прямокутник (boxstyle='round') з контуром
+
+        Як і в matplotlib, рамка тексту не входить у межі для обрізки.
+        """
+        lw = max(1, int(round(points_to_px(linewidth_pt))))
+        half = lw / 2
+        top, bottom = int(round(y0 - half)), int(round(y1 + half))
+        left, right = int(round(x0 - half)), int(round(x1 + half))
+        ys = np.arange(top, bottom)[:, None] + 0.5
+        xs = np.arange(left, right)[None, :] + 0.5
+
+        # Відстань до найближчої точки внутрішнього прямокутника (зменшеного на радіус)
+        dx = np.maximum(np.maximum(x0 + radius - xs, xs - (x1 - radius)), 0)
+        dy = np.maximum(np.maximum(y0 + radius - ys, ys - (y1 - radius)), 0)
+        dist = np.hypot(dx, dy)
+
+        region = self.pixels[top:bottom, left:right]
+        region[dist <= radius + half] = edgecolor
+        region[dist <= radius - half] = facecolor
+
+    def crop(self, extents, pad):
+        """Обрізати до меж намальованого + pad пікселів"""
+        x0 = min(e[0] for e in extents) - pad
+        y0 = min(e[1] for e in extents) - pad
+        x1 = max(e[2] for e in extents) + pad
+        y1 = max(e[3] for e in extents) + pad
+        x0, y0 = max(int(np.floor(x0)), 0), max(int(np.floor(y0)), 0)
+        x1, y1 = min(int(np.ceil(x1)), self.pixels.shape[1]), min(int(np.ceil(y1)), self.pixels.shape[0])
+        return self.pixels[y0:y1, x0:x1]
+
+def text_style(fontsize, fontweight='normal', style='normal'):
+    return (fontsize, fontweight == 'bold', style == 'italic')
+
+class TableTemplate:
+    """Статичний шар таблиці одного макета в масиві індексів палітри
+
+    Той самий інтерфейс, що й render_mpl.TableTemplate: рамка з годинами,
+    колонка підписів, порожня сітка слотів, легенда та постійні тексти
+    малюються один раз; render() фарбує тільки півгодини без світла
+    та змінні тексти на копії полотна.
+    """
+
+    def __init__(self, layout):
+        self.layout = layout
+        self.atlas = get_atlas()
+
+        width = FIG_WIDTH_IN * SAVE_DPI
+        height = int(round(layout.fig_height * SAVE_DPI))
+        canvas = self.canvas = Canvas(width, height)
+
+        table_width = LABEL_W + 24 * CELL_W
+        table_height = layout.header_h + layout.num_rows * CELL_H
+
+        # Осі: одиниці таблиці -> пікселі полотна (вісь Y перевернута - рядок 0 зверху)
+        ax_left, ax_top = canvas.fig_point(AXES_LEFT, AXES_TOP)
+        ax_right, ax_bottom = canvas.fig_point(AXES_RIGHT, AXES_BOTTOM)
+        self.sx = (ax_right - ax_left) / table_width
+        self.sy = (ax_bottom - ax_top) / table_height
+        self.origin = (ax_left, ax_top)
+
+        # Рядок годин
+        self.cell(0, 0, LABEL_W, layout.header_h, HEADER_IDX)
+        for i in range(24):
+            self.cell(LABEL_W + i * CELL_W, 0, CELL_W, layout.header_h, HEADER_IDX)
+
+        # Колонка підписів та порожні слоти
+        for row in range(layout.num_rows):
+            y = layout.header_h + row * CELL_H
+            self.cell(0, y, LABEL_W, CELL_H, LABEL_IDX)
+            for i in range(24):
+                self.cell(LABEL_W + i * CELL_W, y, CELL_W, CELL_H, WHITE_IDX)
+
+        self.table_text(LABEL_W / 2, layout.header_h / 2, layout.corner_label, 12)
+        for i in range(24):
+            self.table_text(LABEL_W + i * CELL_W + CELL_W / 2, layout.header_h / 2, layout.hours[i],
+                            layout.hour_fontsize, linespacing=layout.hour_linespacing or 1.2)
+        for row, label in enumerate(layout.row_labels or ()):
+            self.row_label(canvas, row, label)
+
+        if layout.title:
+            x, y = canvas.fig_point(0.15, 0.97)
+            canvas.text(self.atlas[text_style(18, 'bold')], x, y, layout.title)
+        self.legend(table_width, table_height)
+
+        # Пікселі всередині слотів (без ліній сітки статичного шару): номер півгодини 0..47 для стовпця
+        columns = np.arange(canvas.pixels.shape[1]) + 0.5
+        units = (columns - ax_left) / self.sx - LABEL_W
+        half_of_column = np.where((units >= 0) & (units < 24), np.floor(units * 2), -1).astype(np.int64)
+        first_row = int(ax_top + (layout.header_h + CELL_H / 2) * self.sy)
+        half_of_column[canvas.pixels[first_row] == BORDER_IDX] = -1
+        self.columns = np.flatnonzero(half_of_column >= 0)
+        self.column_halves = half_of_column[self.columns]
+
+        slot_column = self.columns[0]
+        self.row_spans = []
+        for row in range(layout.num_rows):
+            y0 = int(round(ax_top + (layout.header_h + row * CELL_H) * self.sy))
+            y1 = int(round(ax_top + (layout.header_h + (row + 1) * CELL_H) * self.sy))
+            inside = np.flatnonzero(canvas.pixels[y0:y1 + 1, slot_column] != BORDER_IDX) + y0
+            self.row_spans.append((int(inside[0]), int(inside[-1]) + 1))
+
+    def to_px(self, x, y):
+        return self.origin[0] + x * self.sx, self.origin[1] + y * self.sy
+
+    def cell(self, x, y, w, h, color):
+        x0, y0 = self.to_px(x, y)
+        x1, y1 = self.to_px(x + w, y + h)
+        self.canvas.fill(x0, y0, x1, y1, color)
+        self.canvas.stroke(x0, y0, x1, y1, BORDER_IDX, 1.0)
+
+    def table_text(self, x, y, text, fontsize, canvas=None, linespacing=1.2):
+        px, py = self.to_px(x, y)
+        (canvas or self.canvas).text(self.atlas[text_style(fontsize, 'bold')], px, py, text,
+                                     ha='center', va='center', linespacing=linespacing)
+
+    def row_label(self, canvas, row, label):
+        self.table_text(LABEL_W / 2, self.layout.header_h + row * CELL_H + CELL_H / 2, label,
+                        self.layout.label_fontsize, canvas)
+
+    def legend(self, table_width, table_height):
+        """Легенда як у render_mpl.draw_legend"""
+        canvas = self.canvas
+        cell_w = (0.9 - 0.05) / table_width * canvas.width
+        cell_h = (0.85 - 0.15) / table_height * CELL_H * canvas.height
+        atlas = self.atlas[text_style(11)]
+        items = (
+            (-1.8, WHITE_IDX, WHITE_IDX, 'Світло є'),
+            (-0.6, ORANGE_IDX, ORANGE_IDX, 'Світла нема'),
+            (0.6, WHITE_IDX, ORANGE_IDX, 'Світла нема\nперші 30 хв.'),
+            (1.8, ORANGE_IDX, WHITE_IDX, 'Світла нема\nдругі 30 хв.'),
+        )
+        for step, left_color, right_color, label in items:
+            x, y = canvas.fig_point(LEGEND_X_CENTER + step * LEGEND_SPACING, LEGEND_Y)
+            canvas.fill(x - cell_w / 2, y - cell_h / 2, x, y + cell_h / 2, left_color)
+            canvas.fill(x, y - cell_h / 2, x + cell_w / 2, y + cell_h / 2, right_color)
+            canvas.stroke(x - cell_w / 2, y - cell_h / 2, x + cell_w / 2, y + cell_h / 2, BORDER_IDX, 0.5)
+            canvas.text(atlas, x + cell_w / 2 + 0.005 * canvas.width, y, label, va='center')
+
+    def fig_text(self, canvas, fx, fy, text, fontsize=12, fontweight='normal', style='normal',
+                 ha='left', va='baseline', bbox=None):
+        """Аналог fig.text з параметрами, які використовують таблиці (bbox - тільки boxstyle round)"""
+        atlas = self.atlas[text_style(fontsize, fontweight, style)]
+        x, y = canvas.fig_point(fx, fy)
+        if bbox:
+            # Спочатку рамка (розмір - за текстом), потім сам текст поверх неї
+            probe = Canvas(canvas.width, canvas.height)
+            x0, y0, x1, y1 = probe.text(atlas, x, y, text, ha=ha, va=va)
+            pad_pts = float(bbox.get('boxstyle', 'round,pad=0.3').split('pad=')[-1]) * fontsize
+            pad = points_to_px(pad_pts)
+            canvas.rounded_box(x0 - pad, y0 - pad, x1 + pad, y1 + pad, pad,
+                               BASE_COLORS.index(bbox.get('facecolor', GOLD).upper()) * TEXT_LEVELS,
+                               BASE_COLORS.index(bbox.get('edgecolor', BLACK).upper()) * TEXT_LEVELS,
+                               bbox.get('linewidth', 1.0))
+        canvas.text(atlas, x, y, text, ha=ha, va=va)
+
+    def render(self, output_file, slots_rows, row_labels=None, texts=(), last_updated=''):
+        """Намалювати PNG: статичний шар + півгодини без світла, змінні підписи та тексти"""
+        canvas = self.canvas.copy()
+        codes = np.array([slot_codes(slots) for slots in slots_rows], dtype=np.int64).reshape(-1, 24)
+
+        # Коди станів -> півгодини без світла [рядки, 48]: "first" - перша, "second" - друга
+        halves = np.stack([(codes >> 1) & 1, codes & 1], axis=-1).reshape(len(codes), 48).astype(bool)
+        for row, (y0, y1) in enumerate(self.row_spans[:len(codes)]):
+            canvas.pixels[y0:y1, self.columns[halves[row][self.column_halves]]] = ORANGE_IDX
+
+        for row, label in enumerate(row_labels or ()):
+            self.row_label(canvas, row, label)
+        for fx, fy, text, kwargs in texts:
+            self.fig_text(canvas, fx, fy, text, **kwargs)
+        if last_updated:
+            self.fig_text(canvas, 0.8, 0.001, f'Опубліковано {last_updated}', fontsize=11, ha='right',
+                          style='italic')
+
+        image = canvas.crop(canvas.extents, points_to_px(PAD_INCHES * 72))
+        with open(output_file, 'wb') as f:
+            f.write(encode_png(image))
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Компактне кодування розкладу черги на день
+24 слоти GPV = 48 півгодин, біт i = немає світла в i-ту півгодину доби
+Розклад дня - одне 48-бітне число (6 байт) замість словника з 24 рядків
+"""
+
+import hashlib
+
+NUM_SLOTS = 24
+MASK_BYTES = 6
+
+# Стан слота -> (перша півгодина без світла, друга півгодина без світла)
+STATE_BITS = {
+    "yes": (0, 0),
+    "first": (1, 0),
+    "second": (0, 1),
+    "no": (1, 1),
+}
+BITS_STATE = {bits: state for state, bits in STATE_BITS.items()}
+
+def encode_slots(slots):
+    """Словник слотів GPV {"1": "yes", ..., "24": "no"} -> 48-бітна маска
+
+    Відсутні або невідомі слоти вважаються "yes".
+    """
+    mask = 0
+    for slot in range(1, NUM_SLOTS + 1):
+        first, second = STATE_BITS.get(slots.get(str(slot), "yes"), (0, 0))
+        mask |= (first << (2 * slot - 2)) | (second << (2 * slot - 1))
+    return mask
+
+def decode_slots(mask):
+    """48-бітна маска -> словник слотів GPV"""
+    return {
+        str(slot): BITS_STATE[((mask >> (2 * slot - 2)) & 1, (mask >> (2 * slot - 1)) & 1)]
+        for slot in range(1, NUM_SLOTS + 1)
+    }
+
+def mask_to_bytes(mask):
+    return mask.to_bytes(MASK_BYTES, "big")
+
+def mask_from_bytes(data):
+    return int.from_bytes(data, "big")
+
+def mask_to_hex(mask):
+    return f"{mask:012x}"
+
+def changed_slots(old_mask, new_mask):
+    """Номери слотів (1-24), стан яких відрізняється"""
+    diff = old_mask ^ new_mask
+    return [slot for slot in range(1, NUM_SLOTS + 1) if (diff >> (2 * slot - 2)) & 0b11]
+
+def off_halfhours(mask):
+    """Кількість півгодин без світла"""
+    return bin(mask).count("1")
+
+def schedules_hash(masks, timelines=None):
+    """SHA256 набору розкладів {ключ: маска} (ключі сортуються)
+
+    Ключ - рядок, напр. "GPV1.1" або "1765576800/GPV1.1".
+    timelines - необов'язкові хвилинні інтервали {ключ: [[початок, кінець], ...]},
+    що додаються до хешу після масок.
+    """
+    h = hashlib.sha256()
+    for key in sorted(masks):
+        h.update(key.encode())
+        h.update(b"\0")
+        h.update(mask_to_bytes(masks[key]))
+    for key in sorted(timelines or {}):
+        h.update(key.encode())
+        h.update(b"\0")
+        h.update(intervals_to_bytes(timelines[key]))
+    return h.hexdigest()
+
+def intervals_to_bytes(intervals):
+    """Хвилинні інтервали -> байти (2 байти на межу, хвилини 0-1440)"""
+    return b"".join(minute.to_bytes(2, "big") for interval in intervals for minute in interval)
+
+def encode_fact_data(fact_data):
+    """fact.data {день: {GPV: слоти}} -> {"день/GPV": маска}"""
+    return {
+        f"{day}/{gpv_key}": encode_slots(slots)
+        for day, queues in fact_data.items()
+        for gpv_key, slots in queues.items()
+    }
+
+def encode_fact_timeline(fact_timeline):
+    """fact.timeline {день: {GPV: інтервали}} -> {"день/GPV": інтервали}"""
+    return {
+        f"{day}/{gpv_key}": intervals
+        for day, queues in fact_timeline.items()
+        for gpv_key, intervals in queues.items()
+    }
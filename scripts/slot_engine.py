@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Векторизований рушій заповнення слотів GPV
+Усі черги × дні × 24 слоти зберігаються одним масивом uint8,
+код слота - 2 біти (перша / друга половина години без світла)
+Словники GPV будуються тільки при серіалізації
+"""
+
+import numpy as np
+
+# Коди слотів: біт 1 - немає світла першу півгодину, біт 0 - другу
+YES = 0
+SECOND = 1
+FIRST = 2
+NO = 3
+
+STATE_NAMES = ("yes", "second", "first", "no")
+
+# Колонка = номер слота (1-24). Колонка 0 - тільки для сумісності paint_slots з послідовним
+# алгоритмом (вимкнення, що закінчується о 00:MM, писало "first" у слот "0"); paint_intervals її не заповнює
+NUM_COLUMNS = 25
+
+MINUTES_PER_DAY = 1440
+
+# Порядок операцій для одного вимкнення: заливка "no", потім "second", потім "first"
+_OP_CODES = np.array([NO, SECOND, FIRST], dtype=np.uint8)
+
+def paint_slots(cell_idx, start_hour, start_minute, end_hour, end_minute, num_cells):
+    """Зафарбувати вимкнення в масив [num_cells, 25]
+
+    cell_idx - номер комірки (черга × день) для кожного вимкнення.
+    Вимкнення застосовуються в порядку масиву: пізніше перезаписує раніше,
+    як у послідовному алгоритмі, але без циклу по слотах - для кожної
+    клітинки береться операція з найбільшим пріоритетом (індекс × 3 + крок).
+    """
+    cell_idx = np.asarray(cell_idx, dtype=np.int64)
+    start_hour = np.asarray(start_hour, dtype=np.int64)
+    start_minute = np.asarray(start_minute, dtype=np.int64)
+    end_hour = np.asarray(end_hour, dtype=np.int64)
+    end_minute = np.asarray(end_minute, dtype=np.int64)
+
+    codes = np.zeros((num_cells, NUM_COLUMNS), dtype=np.uint8)
+    if cell_idx.size == 0:
+        return codes
+
+    # Слот N охоплює годину (N-1):00-N:00; кінцеві хвилини >= 30 округлюються до наступної години
+    start_slot = start_hour + 1
+    end_slot = end_hour + (end_minute >= 30) + 1
+
+    columns = np.arange(NUM_COLUMNS)
+    fill_mask = (columns >= start_slot[:, None]) & (columns < np.minimum(end_slot, NUM_COLUMNS)[:, None])
+    second_mask = (columns == start_slot[:, None]) & ((start_minute != 0) & (start_slot <= 24))[:, None]
+    # 23:59 - кінець дня, "first" не ставиться
+    first_valid = (end_minute != 0) & (end_slot - 1 <= 24) & ~((end_hour == 23) & (end_minute == 59))
+    first_mask = (columns == (end_slot - 1)[:, None]) & first_valid[:, None]
+
+    best = np.full(num_cells * NUM_COLUMNS, -1, dtype=np.int64)
+    order = np.arange(cell_idx.size) * 3
+    for step, mask in enumerate((fill_mask, second_mask, first_mask)):
+        outage, column = np.nonzero(mask)
+        np.maximum.at(best, cell_idx[outage] * NUM_COLUMNS + column, order[outage] + step)
+
+    painted = best >= 0
+    codes.reshape(-1)[painted] = _OP_CODES[best[painted] % 3]
+    return codes
+
+def paint_intervals(cell_idx, start_min, end_min, num_cells):
+    """Те саме, що paint_slots, для інтервалів у хвилинах (1440 = кінець доби, як 23:59)
+
+    Колонка сумісності 0 не використовується: інтервал, що закінчується о 00:01-00:29
+    (частина вимкнення через північ або вимкнення 00:00-00:MM), - це "first" у слоті 1.
+    """
+    start_min = np.asarray(start_min, dtype=np.int64)
+    end_min = np.asarray(end_min, dtype=np.int64)
+    # Кінець 00:30 дає "first" у слоті 1 за тими самими правилами, що й для інших годин
+    end_min = np.where((end_min > 0) & (end_min < 30), 30, end_min)
+    end_of_day = end_min >= MINUTES_PER_DAY
+    return paint_slots(cell_idx, start_min // 60, start_min % 60,
+                       np.where(end_of_day, 23, end_min // 60), np.where(end_of_day, 59, end_min % 60),
+                       num_cells)
+
+def to_gpv_slots(row):
+    """Рядок кодів [25] -> словник слотів GPV {"1": "yes", ..., "24": "no"}"""
+    names = [STATE_NAMES[c] for c in row.tolist()]
+    slots = {str(i): names[i] for i in range(1, 25)}
+    if names[0] != "yes":
+        slots["0"] = names[0]
+    return slots
+
+def to_masks(codes):
+    """Коди [N, 25] -> 48-бітні маски slot_codec (масив uint64 [N])
+
+    Біт 2*(слот-1) - перша півгодина слота без світла, наступний біт - друга.
+    """
+    slots = codes[:, 1:].astype(np.uint64)
+    shifts = np.arange(24, dtype=np.uint64) * np.uint64(2)
+    first = (slots >> np.uint64(1)) & np.uint64(1)
+    second = slots & np.uint64(1)
+    return ((first << shifts) | (second << (shifts + np.uint64(1)))).sum(axis=1, dtype=np.uint64)
+
+def normalize_intervals(cell_idx, start_min, end_min):
+    """Відсортувати та злити інтервали вимкнень для кожної комірки (черга × день)
+
+    Інтервали - хвилини від початку доби [start, end), 1440 = кінець доби.
+    Перекриті та суміжні інтервали однієї комірки зливаються в один,
+    порожні (end <= start) відкидаються. Повертає (cell_idx, start_min, end_min)
+    злитих інтервалів, відсортованих за коміркою та початком. O(n log n).
+    """
+    cell_idx = np.asarray(cell_idx, dtype=np.int64)
+    start_min = np.asarray(start_min, dtype=np.int64)
+    end_min = np.asarray(end_min, dtype=np.int64)
+
+    valid = end_min > start_min
+    cell_idx, start_min, end_min = cell_idx[valid], start_min[valid], end_min[valid]
+    if cell_idx.size == 0:
+        return cell_idx, start_min, end_min
+
+    order = np.lexsort((start_min, cell_idx))
+    cell_idx, start_min, end_min = cell_idx[order], start_min[order], end_min[order]
+
+    # Зсув на комірку більший за добу, щоб інтервали різних комірок ніколи не зливались
+    offset = cell_idx * (MINUTES_PER_DAY * 2)
+    start_abs = start_min + offset
+    reach = np.maximum.accumulate(end_min + offset)
+
+    # Новий інтервал починається там, де початок правіше за всі попередні кінці
+    new_group = np.ones(cell_idx.size, dtype=bool)
+    new_group[1:] = start_abs[1:] > reach[:-1]
+    group_starts = np.flatnonzero(new_group)
+    group_ends = np.append(group_starts[1:], cell_idx.size) - 1
+
+    merged_cells = cell_idx[group_starts]
+    return merged_cells, start_min[group_starts], reach[group_ends] - merged_cells * (MINUTES_PER_DAY * 2)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Скрипти імпортуються як модулі верхнього рівня (як при запуску з scripts/)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
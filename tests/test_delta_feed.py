@@ -0,0 +1,40 @@
+"""Стрічка змін: номер останнього запису та обірваний останній рядок"""
+
+import json
+
+import delta_feed
+
+def write_feed(path, seqs, tail=b""):
+    with open(path, "wb") as f:
+        for seq in seqs:
+            # Довгі рядки - щоб межі блоків reversed_lines потрапляли всередину записів
+            f.write(json.dumps({"seq": seq, "ops": [{"op": "add", "path": "/x", "value": "v" * 3000}]}).encode() + b"\n")
+        f.write(tail)
+
+def test_last_sequence(tmp_path):
+    path = tmp_path / "feed.jsonl"
+    assert delta_feed.last_sequence(path) == 0
+    write_feed(path, [1, 2, 3])
+    assert delta_feed.last_sequence(path) == 3
+
+def test_truncated_last_line(tmp_path):
+    path = tmp_path / "feed.jsonl"
+    write_feed(path, [1, 2, 3], tail=b'{"seq": 4, "ops": [{"op": "add", "pa')
+    assert delta_feed.last_sequence(path) == 3
+
+    size = path.stat().st_size
+    assert delta_feed.truncate_partial_tail(path) == len(b'{"seq": 4, "ops": [{"op": "add", "pa')
+    assert path.stat().st_size < size
+    assert delta_feed.truncate_partial_tail(path) == 0
+
+    delta_feed.append_record(path, {"seq": 4, "ops": []})
+    with open(path, encoding="utf-8") as f:
+        assert [json.loads(line)["seq"] for line in f] == [1, 2, 3, 4]
+    assert delta_feed.last_sequence(path) == 4
+
+def test_only_partial_line(tmp_path):
+    path = tmp_path / "feed.jsonl"
+    path.write_bytes(b'{"seq": 1')
+    assert delta_feed.last_sequence(path) == 0
+    delta_feed.truncate_partial_tail(path)
+    assert path.read_bytes() == b""
@@ -0,0 +1,77 @@
+"""Історія розкладів: заготовки днів горизонту не є публікацією"""
+
+import history_store
+import outage_analytics
+
+DAY = 1765058400
+KEY = f"{DAY}/GPV1.1"
+# Без світла 10:00-12:00
+MASK = sum(1 << i for i in range(20, 24))
+
+def test_placeholder_then_publish():
+    with history_store.HistoryStore(":memory:") as store:
+        # День увійшов у горизонт (усі "yes") за добу до початку, розклад опублікували за 3 години
+        assert store.ingest({KEY: 0}, {}, DAY - 86400) == []
+        added = store.ingest({KEY: MASK}, {}, DAY - 3 * 3600)
+        assert added == [(KEY, None, MASK)]
+        outage_analytics.update_counters(store.conn, added, DAY - 3 * 3600)
+
+        counters = outage_analytics.load_counters(store.conn)["GPV1.1"]
+        assert counters["days"] == 1
+        assert counters["revisions"] == 0
+        assert counters["lead_seconds"] == 3 * 3600
+
+        cube = outage_analytics.HistoryCube.from_store(store)
+        assert cube.revisions().tolist() == [[0]]
+        assert cube.lead_hours().tolist() == [[3.0]]
+        assert cube.hours_off().tolist() == [[2.0]]
+
+        # Скасування вимкнень після публікації - це зміна розкладу
+        added = store.ingest({KEY: 0}, {}, DAY - 3600)
+        assert added == [(KEY, MASK, 0)]
+        assert outage_analytics.HistoryCube.from_store(store).revisions().tolist() == [[1]]
+
+def test_stored_placeholders_are_skipped():
+    with history_store.HistoryStore(":memory:") as store:
+        # Заготовка, записана старішою версією ingest
+        with store.conn:
+            store.conn.execute(
+                "INSERT INTO snapshots (day, queue, mask, timeline, observed_at) VALUES (?, ?, 0, NULL, ?)",
+                (DAY, "GPV1.1", DAY - 86400))
+        assert store.ingest({KEY: MASK}, {}, DAY - 3600) == [(KEY, None, MASK)]
+
+        cube = outage_analytics.HistoryCube.from_store(store)
+        assert cube.versions.tolist() == [[1]]
+        assert cube.lead_hours().tolist() == [[1.0]]
+
+def test_only_placeholders():
+    with history_store.HistoryStore(":memory:") as store:
+        with store.conn:
+            store.conn.execute(
+                "INSERT INTO snapshots (day, queue, mask, timeline, observed_at) VALUES (?, ?, 0, NULL, ?)",
+                (DAY, "GPV1.1", DAY - 86400))
+        assert outage_analytics.HistoryCube.from_store(store).present.size == 0
+
+def test_rebuild_from_log(tmp_path):
+    log_path = tmp_path / "history.jsonl"
+    with history_store.HistoryStore(str(tmp_path / "a.sqlite")) as store:
+        assert outage_analytics.sync_history(store, log_path) == 0
+        for observed_at, mask in ((DAY - 7200, MASK), (DAY - 3600, MASK | 1)):
+            added = store.ingest({KEY: mask}, {str(DAY): {"GPV1.1": [[600, 720]]}}, observed_at, log_path=log_path)
+            outage_analytics.update_counters(store.conn, added, observed_at)
+        expected = store.history()
+        expected_counters = outage_analytics.load_counters(store.conn)
+        assert outage_analytics.sync_history(store, log_path) == 0
+
+    # Кеш з базою втрачено: журнал (тільки доповнюється, з обірваним останнім рядком) відновлює її
+    with open(log_path, "ab") as f:
+        f.write(b'{"day":1765058400,"que')
+    with history_store.HistoryStore(str(tmp_path / "b.sqlite")) as store:
+        assert outage_analytics.sync_history(store, log_path) == 2
+        assert store.history() == expected
+        assert outage_analytics.load_counters(store.conn) == expected_counters
+
+        # Наступний запис відрізає обірваний рядок і лишає базу синхронною з журналом
+        store.ingest({KEY: 0}, {}, DAY, log_path=log_path)
+        assert outage_analytics.sync_history(store, log_path) == 0
+    assert [line.count(b'"at"') for line in log_path.read_bytes().splitlines()] == [1, 1, 1]
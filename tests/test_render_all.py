@@ -0,0 +1,73 @@
+"""Які таблиці render_all перемальовує (без самого малювання)"""
+
+import json
+
+import pytest
+
+import render_all
+
+# Три доби поспіль за Києвом (без переходу на літній / зимовий час)
+DAYS = ["1765058400", "1765144800", "1765231200"]
+QUEUES = ["GPV1.1", "GPV1.2"]
+
+def day_slots(off_slot):
+    slots = {str(i): "yes" for i in range(1, 25)}
+    slots[str(off_slot)] = "no"
+    return slots
+
+def make_data(today_index, dirty):
+    fact_data = {day: {queue: day_slots(5) for queue in QUEUES} for day in DAYS[today_index:]}
+    return {
+        "fact": {"data": fact_data, "today": int(DAYS[today_index]), "update": "07.12.2025 10:00"},
+        "preset": {"sch_names": {}},
+        "meta": {"dirtySchedules": dirty},
+    }
+
+class FakeTemplate:
+    def __init__(self, names):
+        self.names = names
+
+    def render(self, output_file, *args, **kwargs):
+        output_file.write_bytes(b"png")
+        self.names.append(output_file.name)
+
+@pytest.fixture
+def rendered(monkeypatch):
+    """Назви PNG, "намальованих" під час тесту"""
+    names = []
+
+    def fake_queue_job(job, backend=None):
+        job[0].write_bytes(b"png")
+        names.append(job[0].name)
+
+    def fake_template(table_layout, backend=None):
+        return FakeTemplate(names)
+
+    monkeypatch.setattr(render_all, "render_queue_job", fake_queue_job)
+    monkeypatch.setattr(render_all.layout, "get_template", fake_template)
+    return names
+
+def render(tmp_path, data):
+    json_path = tmp_path / "data.json"
+    json_path.write_text(json.dumps(data), encoding="utf-8")
+    render_all.render_all(json_path, tmp_path / "images", jobs=1, only_dirty=True)
+
+def test_unchanged_schedules_are_skipped(tmp_path, rendered):
+    render(tmp_path, make_data(0, []))
+    assert "gpv-1-1-emergency.png" in rendered
+
+    rendered.clear()
+    render(tmp_path, make_data(0, []))
+    assert rendered == []
+
+def test_midnight_rollover_redraws_with_new_days(tmp_path, rendered):
+    render(tmp_path, make_data(0, []))
+
+    # Наступна доба: розклади ті самі, перераховано тільки нову третю добу горизонту
+    rendered.clear()
+    render(tmp_path, make_data(1, [f"{DAYS[2]}/{queue}" for queue in QUEUES]))
+    assert sorted(rendered) == ["gpv-1-1-emergency.png", "gpv-1-2-emergency.png",
+                                "gpv-all-today.png", "gpv-all-tomorrow.png"]
+
+    hash_file = tmp_path / "images" / "hash" / "gpv-1-1-emergency.hash"
+    assert render_all.record_days(hash_file.read_text()) == DAYS[1:]
@@ -0,0 +1,78 @@
+"""Рушій слотів проти послідовного алгоритму (до векторизації)"""
+
+import random
+
+import numpy as np
+
+import slot_engine
+
+def sequential_slots(intervals):
+    """Послідовний алгоритм заповнення слотів для інтервалів однієї комірки (хвилини, 1440 - кінець доби)
+
+    Запис "first" у слот "0" (вимкнення, що закінчується о 00:MM) - це перша півгодина слота 1.
+    """
+    slots = {str(i): "yes" for i in range(1, 25)}
+    for start, end in intervals:
+        start_hour, start_minute = divmod(start, 60)
+        end_hour, end_minute = (23, 59) if end >= 1440 else divmod(end, 60)
+
+        # Слот N - година (N-1):00-N:00; кінцеві хвилини >= 30 округлюються до наступної години
+        start_slot = start_hour + 1
+        actual_end_hour = end_hour + 1 if end_minute >= 30 else end_hour
+        end_slot = actual_end_hour + 1 if actual_end_hour else 1
+
+        for slot in range(start_slot, end_slot):
+            if slot <= 24:
+                slots[str(slot)] = "no"
+        if start_minute != 0 and start_slot <= 24:
+            slots[str(start_slot)] = "second"
+        if end_minute != 0 and end_slot - 1 <= 24 and not (end_hour == 23 and end_minute == 59):
+            slots[str(max(end_slot - 1, 1))] = "first"
+    return slots
+
+def random_interval(rng):
+    kind = rng.random()
+    if kind < 0.2:
+        # Частина вимкнення через північ: з 00:00 до 00:MM
+        return 0, rng.randint(1, 59)
+    if kind < 0.35:
+        # Частина, що триває до кінця доби
+        return rng.randint(0, 1439), 1440
+    start = rng.randint(0, 1439)
+    return start, min(1440, start + rng.randint(1, 600))
+
+def test_paint_intervals_matches_sequential():
+    rng = random.Random(0)
+    for _ in range(3000):
+        num_cells = rng.randint(1, 4)
+        cells, starts, ends = [], [], []
+        for _ in range(rng.randint(0, 8)):
+            start, end = random_interval(rng)
+            cells.append(rng.randrange(num_cells))
+            starts.append(start)
+            ends.append(end)
+
+        cells, starts, ends = slot_engine.normalize_intervals(cells, starts, ends)
+        codes = slot_engine.paint_intervals(cells, starts, ends, num_cells)
+
+        for cell in range(num_cells):
+            intervals = [(s, e) for c, s, e in zip(cells.tolist(), starts.tolist(), ends.tolist()) if c == cell]
+            assert slot_engine.to_gpv_slots(codes[cell]) == sequential_slots(intervals), intervals
+
+def test_midnight_piece_has_no_slot_zero():
+    # Вимкнення 23:00-00:15: наступна доба отримує частину [0, 15)
+    codes = slot_engine.paint_intervals([0, 1], [1380, 0], [1440, 15], 2)
+    today, tomorrow = (slot_engine.to_gpv_slots(row) for row in codes)
+
+    assert today["24"] == "no"
+    assert "0" not in tomorrow
+    assert tomorrow["1"] == "first"
+    assert all(tomorrow[str(i)] == "yes" for i in range(2, 25))
+    assert int(slot_engine.to_masks(codes)[1]) == 1
+
+def test_normalize_merges_overlaps():
+    cells, starts, ends = slot_engine.normalize_intervals([0, 0, 0, 1], [60, 90, 200, 60], [120, 150, 200, 90])
+    assert cells.tolist() == [0, 1]
+    assert starts.tolist() == [60, 60]
+    assert ends.tolist() == [150, 90]
+    assert np.all(ends > starts)